@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+from conversation_engine import Session, STAGE_TIMEOUTS
+from faq import FAQIndex, FAQRouter
+from history import ConversationHistory
+from patient_prefetch import PatientPrefetcher, PrefetchStats
+from tool_executor import ToolExecutor
+
+class Agent:
+    """
+    Everything Jay's conversations have in common, shared by all sessions in a process.
+
+    The agent owns one API client (and with it one pool of keep-alive connections),
+    the tool registry and its executor (a thread pool with per-thread database
+    connections), the system prompt builder, the FAQ router and index, the
+    speech synthesizer with its TTS cache, and the thread pool that sessions run
+    their blocking work on (recording, playback and tools). Each call gets a Session from
+    session(), which holds only that call's history and audio endpoints, so a
+    process can serve many calls at once.
+
+    Without a synthesizer, sessions are text-only.
+    """
+
+    def __init__(self, client, tools, available_functions, db_connection, prompt, synthesizer=None,
+                 faq_entries=None, faq_top_k=3, faq_threshold=None, faq_excluded=(), faq_phrasings=None,
+                 token_budget=8000, pipelined=True, streaming=True, templated_replies=False, model="gpt-4o", timeouts=None,
+                 transcribe_hedge_after=None, prefetch_patients=True, io_workers=None):
+        """
+        Network calls go through an openai.AsyncOpenAI `client`, while blocking
+        work (recording, playback, database tools) runs on `io_workers` threads.
+
+        With `pipelined=True` the interim message plays while the tools and the
+        second completion run, and the final reply is synthesized while the
+        interim message is still playing. With `streaming=True` completions are
+        streamed and each sentence is sent to speech synthesis as soon as it is
+        complete, so the first audio follows the first sentence rather than the
+        whole reply. With both turned off every stage waits for the previous one,
+        like the original loop, which is useful as a baseline.
+
+        With `templated_replies=True`, tool results with a settled outcome (a
+        booking made, an appointment canceled) are spoken from a template instead
+        of asking the model to phrase them. With a `faq_threshold`, questions that
+        closely match the FAQ are answered without calling the model, and with
+        `faq_top_k` the model is sent only the entries relevant to each turn. With
+        `prefetch_patients`, a patient is looked up as soon as the caller says
+        their email address, while the completion is still in flight.
+        """
+        self.client = client
+        self.tools = tools
+        self.prompt = prompt
+        self.synthesizer = synthesizer
+        self.tool_executor = ToolExecutor(available_functions, db_connection)
+        self.faq_router = None
+        if faq_entries and faq_threshold is not None:
+            self.faq_router = FAQRouter(faq_entries, threshold=faq_threshold, excluded=faq_excluded, phrasings=faq_phrasings)
+        self.faq_index = FAQIndex(faq_entries) if faq_entries and faq_top_k else None
+        self.faq_top_k = faq_top_k
+        self.token_budget = token_budget
+        self.pipelined = pipelined
+        self.streaming = streaming
+        self.templated_replies = templated_replies
+        self.model = model
+        self.timeouts = dict(STAGE_TIMEOUTS, **(timeouts or {}))
+        # Seconds after which a slow transcription is hedged with a second request; None turns it off.
+        self.transcribe_hedge_after = transcribe_hedge_after
+        # Sessions look up a patient as soon as the caller says their email; the counts are kept here.
+        self.prefetch_stats = PrefetchStats() if prefetch_patients else None
+        # Each live call holds about two of these threads at a time; None uses asyncio's default executor.
+        self.io_workers = io_workers
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io") if io_workers else None
+
+    def session(self, source=None, sink=None, barge_in=None):
+        """Starts a new conversation. `source`, `sink` and `barge_in` are only needed for voice calls."""
+        history = ConversationHistory(self.prompt, token_budget=self.token_budget)
+        prefetcher = PatientPrefetcher(self.tool_executor, self.prefetch_stats) if self.prefetch_stats is not None else None
+        return Session(self, history, source=source, sink=sink, barge_in=barge_in, prefetcher=prefetcher)
+
+    def close(self):
+        if self.io_executor is not None:
+            self.io_executor.shutdown(wait=False)
+        self.tool_executor.close()
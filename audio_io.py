@@ -0,0 +1,180 @@
+import time
+import wave
+from contextlib import contextmanager
+import numpy as np
+
+class EndOfAudio(EOFError):
+    """Raised by a file source once the recorded caller audio has been used up."""
+
+class MicrophoneSource:
+    """Reads caller audio from the default input device."""
+
+    def __init__(self, fs=44100, channels=1):
+        self.fs = fs
+        self.channels = channels
+
+    def prepare(self):
+        """Loads PortAudio and checks the input device up front, so the first recording starts at once."""
+        import sounddevice as sd
+        sd.check_input_settings(samplerate=self.fs, channels=self.channels, dtype='float32')
+
+    @contextmanager
+    def stream(self, blocksize):
+        """Opens the device; the yielded object's read(frames) returns a (frames, channels) float32 array."""
+        # Imported here so headless runs do not need PortAudio installed.
+        import sounddevice as sd
+        with sd.InputStream(samplerate=self.fs, channels=self.channels, blocksize=blocksize, dtype='float32') as stream:
+            yield _DeviceReader(stream)
+
+class _DeviceReader:
+    def __init__(self, stream):
+        self._stream = stream
+
+    def read(self, frames):
+        data, _ = self._stream.read(frames)
+        return data
+
+class FileSource:
+    """
+    Feeds a recorded call from a WAV file, block by block, as if it came from a microphone.
+
+    With `realtime=True` blocks are paced at the file's sample rate so timings
+    match a live call; otherwise they are returned as fast as they are asked for.
+    The position carries over between turns, so one file can hold a whole call.
+    """
+
+    def __init__(self, path, realtime=False):
+        import soundfile as sf
+        data, self.fs = sf.read(path, dtype='float32', always_2d=True)
+        self.channels = data.shape[1]
+        self.realtime = realtime
+        self._data = data
+        self._position = 0
+
+    def prepare(self):
+        """Nothing to open; the file was read when the source was created."""
+
+    @property
+    def exhausted(self):
+        return self._position >= len(self._data)
+
+    @contextmanager
+    def stream(self, blocksize):
+        if self.exhausted:
+            raise EndOfAudio("The recorded caller audio has been used up.")
+        yield _FileReader(self)
+
+class _FileReader:
+    def __init__(self, source):
+        self._source = source
+        self._started_at = time.perf_counter()
+        self._frames_read = 0
+        self._block = None
+
+    def read(self, frames):
+        source = self._source
+        if source.exhausted:
+            raise EndOfAudio("The recorded caller audio has been used up.")
+        if self._block is None or len(self._block) != frames:
+            self._block = np.zeros((frames, source.channels), dtype=np.float32)
+        chunk = source._data[source._position:source._position + frames]
+        self._block[:len(chunk)] = chunk
+        # Pad the final short block with silence so every block has the same size.
+        self._block[len(chunk):] = 0
+        source._position += frames
+        self._frames_read += frames
+
+        if source.realtime:
+            due = self._started_at + self._frames_read / source.fs
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return self._block
+
+class SpeakerSink:
+    """Plays 16-bit PCM on the default output device."""
+
+    def prepare(self, samplerate=None):
+        """Loads PortAudio and checks the output device up front, so the first reply plays at once."""
+        import sounddevice as sd
+        sd.check_output_settings(samplerate=samplerate, channels=1, dtype='int16')
+
+    @contextmanager
+    def open(self, samplerate, channels=1):
+        """Opens the device; the yielded object has write(pcm_bytes) and abort()."""
+        import sounddevice as sd
+        with sd.RawOutputStream(samplerate=samplerate, channels=channels, dtype='int16') as stream:
+            yield stream
+
+class NullSink:
+    """
+    Discards audio. With `realtime=True` each write takes as long as the audio would
+    take to play, so turn timings stay realistic without an output device.
+    """
+
+    def __init__(self, realtime=False):
+        self.realtime = realtime
+
+    def prepare(self, samplerate=None):
+        pass
+
+    @contextmanager
+    def open(self, samplerate, channels=1):
+        yield _NullStream(samplerate * channels * 2 if self.realtime else None)
+
+class _NullStream:
+    def __init__(self, bytes_per_second):
+        self._bytes_per_second = bytes_per_second
+
+    def write(self, data):
+        if self._bytes_per_second:
+            time.sleep(len(data) / self._bytes_per_second)
+
+    def abort(self):
+        pass
+
+class CaptureSink:
+    """
+    Collects everything Jay says, optionally saving it to a WAV file, and records
+    when each utterance started and how long its audio is, for latency measurements.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.utterances = []
+        self._samplerate = None
+        self._channels = 1
+
+    def prepare(self, samplerate=None):
+        pass
+
+    @contextmanager
+    def open(self, samplerate, channels=1):
+        self._samplerate = samplerate
+        self._channels = channels
+        record = {"opened_at": time.perf_counter(), "first_write_at": None, "bytes": bytearray()}
+        self.utterances.append(record)
+        yield _CaptureStream(record)
+
+    def save(self):
+        """Writes every captured utterance, back to back, to `path`."""
+        if not self.path or self._samplerate is None:
+            return
+        with wave.open(self.path, 'wb') as wav:
+            wav.setnchannels(self._channels)
+            wav.setsampwidth(2)
+            wav.setframerate(self._samplerate)
+            for record in self.utterances:
+                wav.writeframes(bytes(record["bytes"]))
+
+class _CaptureStream:
+    def __init__(self, record):
+        self._record = record
+
+    def write(self, data):
+        if self._record["first_write_at"] is None:
+            self._record["first_write_at"] = time.perf_counter()
+        self._record["bytes"] += data
+
+    def abort(self):
+        pass
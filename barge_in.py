@@ -0,0 +1,68 @@
+import threading
+from vad import VoiceActivityDetector
+
+class BargeInMonitor:
+    """
+    Keeps listening to the caller's audio source while Jay is speaking.
+
+    When the caller starts talking, `on_speech` is called (typically to cancel
+    playback) and the monitor keeps recording until the caller falls silent, so
+    the interruption can be transcribed as the next turn.
+
+    The detector uses a higher threshold than normal recording so the agent's own
+    voice leaking from the speakers is less likely to trigger it; a headset or an
+    echo-cancelling audio device is still recommended.
+    """
+
+    def __init__(self, source, silence_threshold=0.03, silence_seconds=1.0, max_record_seconds=20):
+        self.source = source
+        self.fs = source.fs
+        self.detector = VoiceActivityDetector(
+            fs=source.fs, channels=source.channels, silence_threshold=silence_threshold,
+            silence_seconds=silence_seconds, max_record_seconds=max_record_seconds,
+            speech_ratio=4.0
+        )
+        self._thread = None
+        self._stop_requested = threading.Event()
+        self.speech_started = threading.Event()
+
+    def start(self, on_speech):
+        """Starts monitoring in a background thread."""
+        self._stop_requested.clear()
+        self.speech_started.clear()
+        self.detector.reset()
+        self._thread = threading.Thread(target=self._run, args=(on_speech,), daemon=True)
+        self._thread.start()
+
+    def _run(self, on_speech):
+        detector = self.detector
+        try:
+            with self.source.stream(detector.blocksize) as stream:
+                while detector.recording_started or not self._stop_requested.is_set():
+                    block = stream.read(detector.blocksize)
+                    was_recording = detector.recording_started
+                    done = detector.process(block)
+                    if detector.recording_started and not was_recording:
+                        print("\nCaller started speaking, stopping playback.")
+                        self.speech_started.set()
+                        on_speech()
+                    if done or detector.full:
+                        return
+        except EOFError:
+            # A recorded call ran out while Jay was speaking; nothing more to hear.
+            return
+
+    def stop(self):
+        """
+        Stops monitoring. If the caller interrupted, waits for them to finish and
+        returns their recording (a view into the detector's buffer); otherwise None.
+        """
+        if self._thread is None:
+            return None
+        self._stop_requested.set()
+        self._thread.join()
+        self._thread = None
+        if not self.speech_started.is_set():
+            return None
+        print("Recording finished.")
+        return self.detector.utterance()
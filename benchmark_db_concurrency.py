@@ -0,0 +1,101 @@
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from db_pool import ConnectionPool
+from migrations import migrate
+
+# Worker thread counts to compare, and how long each run lasts.
+WORKER_COUNTS = (1, 2, 4, 8, 16, 32)
+DURATION = 2.0
+# Share of operations that book an appointment; the rest look a patient up.
+WRITE_SHARE = 0.1
+PATIENTS = 5000
+DOCTORS = ("Dr. Jonas", "Dr. Katherine")
+
+def seed(path):
+    """Creates a database with PATIENTS patients and an appointment each."""
+    pool = ConnectionPool(path)
+    con = pool.connection()
+    migrate(con)
+    start = datetime(2030, 1, 7, 8, 0)
+    con.executemany(
+        "INSERT INTO Patients (PatientName, PatientPhoneNumber, PatientEmail, PatientIllness, InsuranceId) VALUES (?, ?, ?, ?, 1)",
+        [(f"Patient {i}", f"555-{i:07d}", f"patient{i}@example.com", "knee pain") for i in range(PATIENTS)],
+    )
+    con.executemany(
+        "INSERT INTO Appointments (PatientId, DoctorName, AppointmentTimeStart, AppointmentTimeEnd) VALUES (?, ?, ?, ?)",
+        [(i + 1, DOCTORS[i % 2], f"{start + timedelta(minutes=30 * (i // 2)):%Y-%m-%d %H:%M:%S}",
+          f"{start + timedelta(minutes=30 * (i // 2) + 30):%Y-%m-%d %H:%M:%S}") for i in range(PATIENTS)],
+    )
+    con.commit()
+    pool.close()
+
+def worker(pool, stop, counts, seed_value):
+    """Looks patients up and books appointments until `stop` is set, like the tools do."""
+    rng = random.Random(seed_value)
+    con = pool.connection()
+    reads = writes = locked = 0
+    while not stop.is_set():
+        try:
+            if rng.random() < WRITE_SHARE:
+                start = datetime(2031, 1, 1) + timedelta(minutes=30 * rng.randrange(10 ** 6))
+                try:
+                    con.execute(
+                        "INSERT INTO Appointments (PatientId, DoctorName, AppointmentTimeStart, AppointmentTimeEnd) VALUES (?, ?, ?, ?)",
+                        (rng.randrange(1, PATIENTS + 1), rng.choice(DOCTORS), f"{start:%Y-%m-%d %H:%M:%S}",
+                         f"{start + timedelta(minutes=30):%Y-%m-%d %H:%M:%S}"),
+                    )
+                    con.commit()
+                except sqlite3.IntegrityError:
+                    con.rollback()
+                writes += 1
+            else:
+                patient = rng.randrange(PATIENTS)
+                row = con.execute("SELECT PatientId, PatientName FROM Patients WHERE PatientEmail = ?",
+                                  (f"patient{patient}@example.com",)).fetchone()
+                con.execute("SELECT AppointmentId, DoctorName, AppointmentTimeStart FROM Appointments "
+                            "WHERE PatientId = ? AND AppointmentTimeStart >= ? ORDER BY AppointmentTimeStart",
+                            (row[0], "2030-01-01 00:00:00")).fetchall()
+                reads += 1
+        except sqlite3.OperationalError:
+            # "database is locked" after the busy timeout ran out.
+            if con.in_transaction:
+                con.rollback()
+            locked += 1
+    counts.append((reads, writes, locked))
+
+def run(path, journal_mode, workers):
+    """Runs `workers` threads on one pool for DURATION seconds; returns (reads/s, writes/s, locked errors)."""
+    pool = ConnectionPool(path, journal_mode=journal_mode)
+    stop = threading.Event()
+    counts = []
+    threads = [threading.Thread(target=worker, args=(pool, stop, counts, i)) for i in range(workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return (sum(c[0] for c in counts) / elapsed, sum(c[1] for c in counts) / elapsed, sum(c[2] for c in counts))
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    print(f"{PATIENTS} patients, {WRITE_SHARE:.0%} writes, {DURATION:.0f}s per run.\n")
+    print(f"{'journal':>8} {'workers':>8} {'reads/s':>10} {'writes/s':>10} {'locked':>8}")
+    for journal_mode in ("DELETE", "WAL"):
+        # A fresh file per mode, so one mode's writes do not slow the other's reads.
+        path = os.path.join(directory, f"bench_{journal_mode.lower()}.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            seed(path)
+        for workers in WORKER_COUNTS:
+            reads, writes, locked = run(path, journal_mode, workers)
+            print(f"{journal_mode:>8} {workers:>8} {reads:>10.0f} {writes:>10.0f} {locked:>8}")
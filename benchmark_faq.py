@@ -0,0 +1,93 @@
+import random
+import sys
+import time
+from faq import FAQIndex, FAQRouter, format_faq, load_faq
+from history import count_tokens
+from main import FAQ_ROUTER_EXCLUDED, FAQ_ROUTER_PHRASINGS
+
+# Knowledge-base sizes to compare, in FAQ entries.
+SIZES = (16, 160, 1600, 16000)
+TOP_K = 3
+
+QUERIES = [
+    "Where are you located?",
+    "What's your phone number?",
+    "Do I need a referral to see Dr. Jonas?",
+    "Are you open on Saturday?",
+    "I tore my ACL playing soccer, can you help?",
+    "Can my husband come with me to the appointment?",
+]
+
+# What callers say and the FAQ question the router should answer it with, or
+# None where the turn must go to the model (and its tools).
+ROUTER_CHECKS = [
+    ("Where are you located?", "Where is Stemmee Surgery Center located?"),
+    ("Okay, and what's your address?", "Where is Stemmee Surgery Center located?"),
+    ("What's your phone number?", "What phone numbers can I use to contact the clinic?"),
+    ("Hi, what are your hours on weekdays?", "What are your clinic hours?"),
+    ("How long does an appointment take?", "How long does a typical appointment take?"),
+    ("Do I need a referral to see a doctor?", "Do I need a referral to see a doctor?"),
+    ("Do you accept Aetna insurance?", None),
+    ("Do you accept insurance?", None),
+    ("My phone number is 555 123 4567.", None),
+    ("I want to update my phone number.", None),
+    ("I'd like to book an appointment for my knee.", None),
+    ("Can I cancel my appointment?", None),
+    ("Where is my appointment?", None),
+]
+
+def synthetic_faq(base, size, seed=0):
+    """Grows the real FAQ to `size` entries with made-up topics, so the index has realistic variety."""
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ne", "su", "ta", "ri", "vo", "pe", "zu", "an", "or"]
+    vocabulary = ["".join(rng.choice(syllables) for _ in range(3)) for _ in range(5000)]
+    entries = list(base)
+    while len(entries) < size:
+        template = rng.choice(base)
+        topic = " ".join(rng.sample(vocabulary, 3))
+        extra = " ".join(rng.sample(vocabulary, 12))
+        entries.append({
+            "category": template["category"],
+            "question": f"{template['question'][:-1]} for {topic}?",
+            "answer": f"{template['answer']} {extra}.",
+        })
+    return entries[:size]
+
+if __name__ == "__main__":
+    base = load_faq()
+    print(f"{'entries':>8} {'full FAQ tokens':>16} {'top-k tokens':>13} {'index build':>12} {'query':>10}")
+    for size in SIZES:
+        entries = synthetic_faq(base, size)
+        full_tokens = count_tokens(format_faq(entries))
+
+        start = time.perf_counter()
+        index = FAQIndex(entries)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        retrieved_tokens = 0
+        start = time.perf_counter()
+        rounds = 20
+        for _ in range(rounds):
+            for query in QUERIES:
+                index.search(query, TOP_K)
+        query_us = (time.perf_counter() - start) / (rounds * len(QUERIES)) * 1e6
+        for query in QUERIES:
+            retrieved_tokens += count_tokens(format_faq(index.search(query, TOP_K)))
+
+        print(f"{size:>8} {full_tokens:>16} {retrieved_tokens / len(QUERIES):>13.0f} "
+              f"{build_ms:>10.1f}ms {query_us:>8.0f}us")
+
+    print("\nTop results on the real FAQ:")
+    index = FAQIndex(base)
+    for query in QUERIES:
+        print(f"  {query} -> {index.search(query, 1)[0]['question']}")
+
+    print("\nFAQ router on the real FAQ:")
+    router = FAQRouter(base, excluded=FAQ_ROUTER_EXCLUDED, phrasings=FAQ_ROUTER_PHRASINGS)
+    failures = 0
+    for text, expected in ROUTER_CHECKS:
+        question, score = router.match(text)
+        routed = question if score >= router.threshold else None
+        failures += routed != expected
+        print(f"  {'ok  ' if routed == expected else 'FAIL'} {text!r} -> {routed} ({score})")
+    sys.exit(1 if failures else 0)
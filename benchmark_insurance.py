@@ -0,0 +1,110 @@
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from thefuzz import process
+from db_pool import connect
+from insurance_index import insurance_index
+from migrations import migrate
+
+# Payer directory sizes to compare.
+SIZES = (15, 1000, 10000)
+
+QUERIES = [
+    "Aetna",
+    "BCBS",
+    "blue cross",
+    "United Health Care",
+    "kaiser",
+    "Cigna insurance",
+    "Humanaa",
+    "Star Health",
+    "Medicaid",
+]
+
+# What callers say and the payer it should match in the real Insurance table
+# (None for no match), with how the old full-table scan matched it where that
+# differs on purpose. Generic words must not reach a payer through an alias.
+MATCH_CHECKS = [
+    ("Aetna", "Aetna"),
+    ("Humanaa", "Humana"),
+    ("Humana Medicare", "Humana"),
+    ("Cigna insurance", "Cigna"),
+    ("United Health Care", "UnitedHealthcare"),
+    ("kaiser", "Kaiser Permanente"),
+    ("BCBS", "Blue Cross Blue Shield"),  # The old scan found no match.
+    ("Star Health", "Star Health (India)"),
+    ("Medicare", None),
+    ("United Concordia", None),
+    ("Medicaid", None),
+    ("Tricare", None),
+]
+
+def synthetic_payers(size, seed=0):
+    """Made-up plans in the style of real payer directories, numbered after the 15 real payers."""
+    rng = random.Random(seed)
+    regions = ["Texas", "Ohio", "Pacific", "Midwest", "Northeast", "Florida", "Valley", "Mountain", "Coastal", "Capital"]
+    brands = ["Sun", "Harbor", "Summit", "Pioneer", "Liberty", "Evergreen", "Keystone", "Granite", "Meridian", "Cedar",
+              "Atlas", "Beacon", "Crescent", "Frontier", "Horizon", "Lakeside", "Northstar", "Redwood", "Sterling", "Unity"]
+    kinds = ["Health", "Care", "Health Plan", "Medical", "Mutual", "Benefits", "Assurance", "HMO", "PPO", "Advantage"]
+    payers = []
+    for insurance_id in range(16, size + 1):
+        name = f"{rng.choice(brands)} {rng.choice(regions)} {rng.choice(kinds)} {insurance_id}"
+        payers.append((insurance_id, name, rng.random() < 0.8, "General, Cardiology"))
+    return payers
+
+def old_lookup(con, insurance_name):
+    """What the tools did before: score every name in the table, then fetch the match."""
+    names = [row[0] for row in con.execute("SELECT InsuranceName FROM Insurance").fetchall()]
+    best_match, score = process.extractOne(insurance_name, names)
+    if score < 80:
+        return None
+    return con.execute("SELECT InsuranceId, IsSupported, DiseasesCovered FROM Insurance WHERE InsuranceName = ?",
+                       (best_match,)).fetchone()
+
+def time_per_query(lookup, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in QUERIES:
+            lookup(query)
+    return (time.perf_counter() - start) / (rounds * len(QUERIES)) * 1000
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    print(f"{'payers':>7} {'index build':>12} {'SELECT all + extractOne':>24} {'index lookup':>13} {'speedup':>8}")
+    for size in SIZES:
+        con = connect(os.path.join(directory, f"payers_{size}.db"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate(con)
+        con.executemany("INSERT INTO Insurance VALUES (?, ?, ?, ?)", synthetic_payers(size))
+        con.commit()
+
+        start = time.perf_counter()
+        insurance_index(con)
+        build_ms = (time.perf_counter() - start) * 1000
+        rounds = max(1, 2000 // size)
+        old_ms = time_per_query(lambda query: old_lookup(con, query), rounds)
+        new_ms = time_per_query(lambda query: insurance_index(con).match(query), rounds * 20)
+        print(f"{size:>7} {build_ms:>10.1f}ms {old_ms:>22.2f}ms {new_ms:>11.3f}ms {old_ms / new_ms:>7.0f}x")
+        con.close()
+
+    print("\nMatches at the largest size:")
+    for query in QUERIES:
+        payer, score = insurance_index(connect(os.path.join(directory, f"payers_{SIZES[-1]}.db"))).match(query)
+        print(f"  {query!r:<22} -> {payer['name'] if payer else None} ({score})")
+
+    print("\nOld and new matches on the real payers:")
+    con = connect(os.path.join(directory, f"payers_{SIZES[0]}.db"))
+    failures = 0
+    for query, expected in MATCH_CHECKS:
+        old = old_lookup(con, query)
+        old_name = con.execute("SELECT InsuranceName FROM Insurance WHERE InsuranceId = ?", (old[0],)).fetchone()[0] if old else None
+        payer, score = insurance_index(con).match(query)
+        name = payer["name"] if payer else None
+        failures += name != expected
+        print(f"  {'ok  ' if name == expected else 'FAIL'} {query!r:<20} old {old_name}, new {name} ({score})")
+    con.close()
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,77 @@
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from agent import Agent
+from prompt_builder import PromptBuilder
+
+# Numbers of concurrent conversations to compare.
+SESSION_COUNTS = (1, 10, 100, 500)
+CHAT_LATENCY = 0.4
+
+CALLER_LINES = [
+    "Hi, I'd like to book an appointment for my knee.",
+    "Do you accept Aetna insurance?",
+    "Great, what times do you have on Monday?",
+]
+
+class EchoAsyncClient:
+    """Stands in for openai.AsyncOpenAI, answering every session after a simulated delay."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._complete))
+
+    async def _complete(self, messages, **kwargs):
+        await asyncio.sleep(CHAT_LATENCY)
+        reply = f"Thanks, I can help with that. You said: {messages[-1]['content']}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+            role="assistant", content=reply, tool_calls=None))])
+
+async def run_sessions(agent, count):
+    """Runs `count` text conversations at once; returns the sessions and the wall-clock time."""
+    sessions = [agent.session() for _ in range(count)]
+
+    async def converse(session):
+        await session.greet("Hello, this is Jay.")
+        for line in CALLER_LINES:
+            await session.respond(line)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(converse(session) for session in sessions))
+    return sessions, time.perf_counter() - start
+
+if __name__ == "__main__":
+    # Work in a scratch directory so the benchmark never touches the real clinic_data.db.
+    prompt_template = os.path.abspath("prompt_template.txt")
+    os.chdir(tempfile.mkdtemp())
+    with contextlib.redirect_stdout(io.StringIO()):
+        from database import initialize_database
+        db_connection = initialize_database()
+
+    agent = Agent(
+        client=EchoAsyncClient(),
+        tools=[],
+        available_functions={},
+        db_connection=db_connection,
+        prompt=PromptBuilder(template_path=prompt_template, faq_content=""),
+        streaming=False,
+    )
+
+    print(f"{'sessions':>8} {'wall time':>10} {'memory':>10} {'per session':>12}")
+    for count in SESSION_COUNTS:
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        with contextlib.redirect_stdout(io.StringIO()):
+            sessions, elapsed = asyncio.run(run_sessions(agent, count))
+        # Measure while the sessions are still alive, after every turn has run.
+        used = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        del sessions
+        print(f"{count:>8} {elapsed:>9.2f}s {used / 1024:>8.0f}KB {used / count / 1024:>10.1f}KB")
+
+    agent.close()
+    db_connection.close()
@@ -0,0 +1,75 @@
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from database import SLOTS_PER_DAY, assign_doctor, check_availability, find_available_slots
+from db_pool import connect
+from migrations import migrate
+
+# Years of bookings to fill the calendar with, and how full each day is.
+YEARS = (1, 5, 10)
+OCCUPANCY = 0.9
+SEARCH_DAYS = 14
+SLOTS_WANTED = 5
+
+def seed(con, years, start, seed_value=0):
+    """Books OCCUPANCY of every weekday slot for both doctors over `years` years from `start`."""
+    rng = random.Random(seed_value)
+    rows = []
+    for offset in range(years * 365):
+        day = start + timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        for doctor in ("Dr. Jonas", "Dr. Katherine"):
+            for index in range(SLOTS_PER_DAY):
+                if rng.random() < OCCUPANCY:
+                    begin = datetime(day.year, day.month, day.day, 8) + timedelta(minutes=30 * index)
+                    rows.append((1, doctor, f"{begin:%Y-%m-%d %H:%M:%S}", f"{begin + timedelta(minutes=30):%Y-%m-%d %H:%M:%S}"))
+    con.executemany("INSERT INTO Appointments (PatientId, DoctorName, AppointmentTimeStart, AppointmentTimeEnd) VALUES (?, ?, ?, ?)", rows)
+    con.commit()
+    return len(rows)
+
+def probe_one_by_one(con, illness, from_date):
+    """The old way of finding a time: check one slot after another until enough are free."""
+    found = []
+    day = datetime.strptime(from_date, '%Y-%m-%d').date()
+    for offset in range(SEARCH_DAYS):
+        current = day + timedelta(days=offset)
+        if current.weekday() >= 5:
+            continue
+        for index in range(SLOTS_PER_DAY):
+            minute = 8 * 60 + 30 * index
+            result = check_availability(con, f"{current:%Y-%m-%d}", f"{minute // 60:02d}:{minute % 60:02d}", illness)
+            if result["status"] == "available":
+                found.append((current, minute))
+                if len(found) == SLOTS_WANTED:
+                    return found
+    return found
+
+def time_call(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    # Start the calendar at the next Monday, so every search lies in the future.
+    today = date.today()
+    start = today + timedelta(days=7 - today.weekday())
+    print(f"{OCCUPANCY:.0%} of slots booked; looking for {SLOTS_WANTED} free slots with {assign_doctor('knee pain')}.\n")
+    print(f"{'years':>6} {'appointments':>13} {'bitmap search':>14} {'slot-by-slot':>13}")
+    for years in YEARS:
+        con = connect(os.path.join(directory, f"slots_{years}.db"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate(con)
+        count = seed(con, years, start)
+        # Search in the middle of the booked range, where the index is largest on both sides.
+        from_date = f"{start + timedelta(days=years * 365 // 2):%Y-%m-%d}"
+        bitmap_ms = time_call(lambda: find_available_slots(con, "knee pain", from_date, SEARCH_DAYS, SLOTS_WANTED), 200)
+        probe_ms = time_call(lambda: probe_one_by_one(con, "knee pain", from_date), 20)
+        print(f"{years:>6} {count:>13} {bitmap_ms:>12.3f}ms {probe_ms:>11.3f}ms")
+        con.close()
@@ -0,0 +1,70 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules that must not load when main.py is imported; they belong on the startup
+# threads or on first use. Seeing one here means an eager import crept back in.
+DEFERRED_MODULES = ("openai", "httpx", "numpy", "sounddevice", "soundfile", "pandas", "pytz", "thefuzz", "sendgrid", "tiktoken")
+
+# Import time budget for `import main`, in milliseconds.
+DEFAULT_BUDGET_MS = 75
+
+_MARKER = "-- startup done --"
+
+def import_times(statement):
+    """
+    Runs `statement` in a fresh interpreter with -X importtime and returns
+    {module: (self_us, cumulative_us)} for every module it imported, leaving
+    out what the interpreter imports at startup on its own.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"print('{_MARKER}', file=__import__('sys').stderr); {statement}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"`{statement}` failed:\n{result.stderr.strip().splitlines()[-1]}")
+    times = {}
+    output = result.stderr.split(_MARKER, 1)[-1]
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+def report(label, times, top=10):
+    total_ms = sum(self_us for self_us, _ in times.values()) / 1000
+    print(f"{label}: {total_ms:.1f} ms across {len(times)} modules.")
+    for name, (self_us, cumulative_us) in sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:top]:
+        print(f"  {self_us / 1000:>7.1f} ms self {cumulative_us / 1000:>8.1f} ms cumulative  {name}")
+    return total_ms
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure startup import time and fail if main.py imports too much.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Maximum import time of main.py.")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to try; the fastest run counts.")
+    args = parser.parse_args()
+
+    runs = [import_times("import main") for _ in range(args.runs)]
+    best = min(runs, key=lambda times: sum(self_us for self_us, _ in times.values()))
+    total_ms = report("import main", best)
+    # For comparison: what the startup threads import while the devices open.
+    try:
+        report("\nimport main + runtime modules", import_times(
+            "import main, agent, database, speech, transcription, http_clients; http_clients.OpenAIClients(api_key='x')"
+        ), top=5)
+    except RuntimeError as e:
+        print(f"\nCould not time the runtime modules: {e}")
+
+    failures = []
+    eager = sorted({name.split(".")[0] for name in best} & set(DEFERRED_MODULES))
+    if eager:
+        failures.append(f"main.py imports {', '.join(eager)} eagerly.")
+    if total_ms > args.budget_ms:
+        failures.append(f"import main took {total_ms:.1f} ms, over the {args.budget_ms:.0f} ms budget.")
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("\nOK: startup imports are within budget.")
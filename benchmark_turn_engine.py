@@ -0,0 +1,147 @@
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+import numpy as np
+from audio_io import NullSink
+from agent import Agent
+from speech import SpeechSynthesizer, PCM_BYTES_PER_CHAR
+
+# Simulated service latencies in seconds, roughly what we see from the real APIs.
+TRANSCRIBE_LATENCY = 0.5
+CHAT_FIRST_TOKEN_LATENCY = 0.4
+CHAT_WORDS_PER_SECOND = 25
+TTS_FIRST_BYTE_LATENCY = 0.3
+
+# (caller says, interim message or None, tool call or None, final reply)
+SCRIPT = [
+    ("What are your clinic hours?", None, None,
+     "Our standard hours are Monday to Friday, 8 AM to 5 PM. On Saturdays we see patients by appointment only, "
+     "and on Sundays the clinic is closed. Would you like to book a visit?"),
+    ("Do you accept Aetna insurance?", "Let me check that for you.",
+     ("check_insurance_coverage", '{"insurance_name": "Aetna"}'),
+     "Yes, we accept Aetna. Would you like to book an appointment?"),
+    ("Is Blue Cross okay for my husband?", "One moment while I look that up.",
+     ("check_insurance_coverage", '{"insurance_name": "Blue Cross"}'),
+     "Yes, we accept Blue Cross Blue Shield, and it covers orthopedic care. Is there anything else?"),
+]
+
+def _message(content, tool_call=None):
+    tool_calls = None
+    if tool_call:
+        name, arguments = tool_call
+        tool_calls = [SimpleNamespace(id="call_1", type="function",
+                                      function=SimpleNamespace(name=name, arguments=arguments))]
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+        role="assistant", content=content, tool_calls=tool_calls))])
+
+class ScriptedAsyncClient:
+    """Stands in for openai.AsyncOpenAI, answering from SCRIPT at a simulated generation speed."""
+
+    def __init__(self):
+        self.turn = -1
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self._transcribe))
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._complete))
+
+    async def _transcribe(self, **kwargs):
+        await asyncio.sleep(TRANSCRIBE_LATENCY)
+        self.turn += 1
+        return SimpleNamespace(text=SCRIPT[self.turn][0])
+
+    async def _complete(self, messages, stream=False, **kwargs):
+        _, interim, tool_call, reply = SCRIPT[self.turn]
+        if tool_call and "tools" in kwargs:
+            content = interim
+        else:
+            content, tool_call = reply, None
+        if stream:
+            return self._stream(content, tool_call)
+        await asyncio.sleep(CHAT_FIRST_TOKEN_LATENCY + len(content.split()) / CHAT_WORDS_PER_SECOND)
+        return _message(content, tool_call)
+
+    async def _stream(self, content, tool_call):
+        """Streams the content word by word at the simulated generation speed."""
+        await asyncio.sleep(CHAT_FIRST_TOKEN_LATENCY)
+        for i, word in enumerate(content.split(" ")):
+            await asyncio.sleep(1 / CHAT_WORDS_PER_SECOND)
+            text = word if i == 0 else " " + word
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text, tool_calls=None))])
+        if tool_call:
+            name, arguments = tool_call
+            half = len(arguments) // 2
+            fragments = [
+                SimpleNamespace(index=0, id="call_1", function=SimpleNamespace(name=name, arguments=arguments[:half])),
+                SimpleNamespace(index=0, id=None, function=SimpleNamespace(name=None, arguments=arguments[half:])),
+            ]
+            for fragment in fragments:
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None, tool_calls=[fragment]))])
+
+class _SpeechResponse:
+    def __init__(self, text):
+        self.text = text
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_bytes(self, chunk_size):
+        time.sleep(TTS_FIRST_BYTE_LATENCY)
+        remaining = len(self.text) * PCM_BYTES_PER_CHAR
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            remaining -= size
+            yield bytes(size)
+
+class SimulatedSpeechClient:
+    """Stands in for the openai module's speech endpoint, producing silent PCM of realistic length."""
+
+    def __init__(self):
+        create = lambda **kwargs: _SpeechResponse(kwargs["input"])
+        self.audio = SimpleNamespace(speech=SimpleNamespace(
+            with_streaming_response=SimpleNamespace(create=create)))
+
+async def run_conversation(pipelined, streaming, db_connection, available_functions):
+    agent = Agent(
+        client=ScriptedAsyncClient(),
+        tools=[],
+        available_functions=available_functions,
+        db_connection=db_connection,
+        prompt="You are Jay.",
+        synthesizer=SpeechSynthesizer(client=SimulatedSpeechClient(), sink=NullSink(realtime=True)),
+        pipelined=pipelined,
+        streaming=streaming,
+    )
+    session = agent.session(source=SimpleNamespace(fs=16000, channels=1))
+    audio = np.zeros((16000, 1), dtype=np.float32)
+    for _ in SCRIPT:
+        await session.run_turn(audio, 16000)
+    agent.close()
+    return session.turn_timings
+
+if __name__ == "__main__":
+    # Work in a scratch directory so the benchmark never touches the real clinic_data.db.
+    os.chdir(tempfile.mkdtemp())
+    with contextlib.redirect_stdout(io.StringIO()):
+        from database import initialize_database, check_insurance_coverage
+        db_connection = initialize_database()
+    available_functions = {"check_insurance_coverage": check_insurance_coverage}
+
+    modes = (("sequential", False, False), ("pipelined", True, False), ("streaming", True, True))
+    results = {}
+    for label, pipelined, streaming in modes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[label] = asyncio.run(run_conversation(pipelined, streaming, db_connection, available_functions))
+
+    print("Time to first audio / total turn time:")
+    print(f"{'turn':<6}" + "".join(f"{label:>22}" for label, _, _ in modes))
+    for i in range(len(SCRIPT)):
+        row = "".join(f"{results[label][i]['first_audio']:>9.0f}ms /{results[label][i]['total']:>7.0f}ms" for label, _, _ in modes)
+        print(f"{i + 1:<6}{row}")
+    for label, _, _ in modes:
+        total = sum(t["total"] for t in results[label]) / 1000
+        print(f"{label}: {total:.2f}s for {len(SCRIPT)} turns")
@@ -0,0 +1,98 @@
+import contextlib
+import io
+import time
+import tracemalloc
+import numpy as np
+from vad import VoiceActivityDetector
+
+FS = 44100
+CHECK_INTERVAL = 15
+BLOCKSIZE = FS // CHECK_INTERVAL
+
+def make_blocks(seconds=20, noise_level=0.004, seed=0):
+    """
+    Builds a synthetic call: background noise with a few seconds of 'speech' in the middle.
+    Returns a list of (blocksize, 1) float32 blocks, as sounddevice would hand them over.
+    """
+    rng = np.random.default_rng(seed)
+    total = seconds * FS
+    audio = rng.normal(0, noise_level, total).astype(np.float32)
+    t = np.arange(4 * FS) / FS
+    speech = (0.2 * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+    audio[2 * FS:6 * FS] += speech
+    audio = audio.reshape(-1, 1)
+    return [audio[i:i + BLOCKSIZE].copy() for i in range(0, total - BLOCKSIZE + 1, BLOCKSIZE)]
+
+def legacy_record(blocks, silence_threshold=0.01, silence_seconds=2.0):
+    """The per-block logic of the original main.record_audio, minus the device I/O."""
+    silent_blocks_needed = int(silence_seconds * CHECK_INTERVAL)
+    pre_buffer_size = CHECK_INTERVAL // 2
+    recorded_frames = []
+    pre_buffer = []
+    silent_blocks_count = 0
+    recording_started = False
+    for audio_chunk in blocks:
+        rms = np.sqrt(np.mean(audio_chunk**2))
+        is_silent = rms < silence_threshold
+        if recording_started:
+            recorded_frames.append(audio_chunk)
+            if is_silent:
+                silent_blocks_count += 1
+            else:
+                silent_blocks_count = 0
+            if silent_blocks_count >= silent_blocks_needed:
+                break
+        else:
+            if not is_silent:
+                recording_started = True
+                recorded_frames.extend(pre_buffer)
+                recorded_frames.append(audio_chunk)
+            else:
+                pre_buffer.append(audio_chunk)
+                if len(pre_buffer) > pre_buffer_size:
+                    pre_buffer.pop(0)
+    if not recorded_frames:
+        return np.array([], dtype='float32')
+    recording = np.concatenate(recorded_frames, axis=0)
+    trailing = silent_blocks_count * BLOCKSIZE
+    if trailing > 0 and len(recording) > trailing:
+        recording = recording[:-trailing]
+    return recording
+
+def measure(label, run, blocks, repeats=50):
+    """Times `run` over the blocks and records allocations for a single pass."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        run(blocks)  # warm up
+        start = time.process_time()
+        for _ in range(repeats):
+            result = run(blocks)
+        cpu = time.process_time() - start
+
+        tracemalloc.start()
+        run(blocks)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    per_block_us = cpu / (repeats * len(blocks)) * 1e6
+    print(f"{label:<12} {per_block_us:>8.2f} us/block  {peak / 1024:>9.1f} KiB peak allocated  "
+          f"{current / 1024:>9.1f} KiB still held  ({len(result) / FS:.2f}s recorded)")
+
+if __name__ == "__main__":
+    blocks = make_blocks()
+    detector = VoiceActivityDetector(fs=FS)
+
+    def detector_record(blocks):
+        it = iter(blocks)
+        return detector.listen(lambda frames: next(it))
+
+    print(f"{len(blocks)} blocks of {BLOCKSIZE} samples\n")
+    measure("legacy", legacy_record, blocks)
+    measure("ring-buffer", detector_record, blocks)
+
+    print("\nNoisy room (background RMS ~0.02, above the fixed 0.01 threshold):")
+    noisy = make_blocks(noise_level=0.02, seed=1)
+    detector = VoiceActivityDetector(fs=FS)
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy = legacy_record(noisy)
+        adaptive = detector_record(noisy)
+    print(f"legacy recorded {len(legacy) / FS:.2f}s, adaptive recorded {len(adaptive) / FS:.2f}s (speech is 4.00s)")
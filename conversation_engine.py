@@ -0,0 +1,418 @@
+import asyncio
+import json
+import time
+import uuid
+import tracing
+from http_clients import request_timeout
+from vad import detector_for, record_audio
+from transcription import transcribe_async
+from audio_io import EndOfAudio
+from speech import SentenceStreamer, split_sentences
+from reply_templates import render_reply
+from faq import format_faq
+
+# Per-stage time limits in seconds. A stage that overruns aborts the turn.
+STAGE_TIMEOUTS = {
+    "transcribe": 20.0,
+    "chat": 30.0,
+    "tools": 30.0,
+}
+
+RETRY_PHRASE = "Sorry, I didn't catch that. Could you please repeat it?"
+ERROR_PHRASE = "I'm sorry, a system error occurred. Could you please say that again?"
+
+class StageTimeout(Exception):
+    """Raised when a stage of a turn takes longer than its time limit."""
+
+    def __init__(self, stage, timeout):
+        super().__init__(f"The {stage} stage timed out after {timeout:.0f}s.")
+        self.stage = stage
+
+def _tool_call_to_dict(tool_call):
+    """Converts an SDK tool call object into the plain dict stored in the history."""
+    return {
+        "id": tool_call.id,
+        "type": "function",
+        "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments},
+    }
+
+def _unanswered_tool_messages(tool_calls, error):
+    """
+    Tool replies for calls whose results never came back. A timed-out tool
+    keeps running in its thread, so its outcome is unknown rather than failed.
+    """
+    outcome = "it timed out and may still have completed" if isinstance(error, StageTimeout) else f"it failed: {error}"
+    return [
+        {
+            "tool_call_id": tool_call["id"],
+            "role": "tool",
+            "name": tool_call["function"]["name"],
+            "content": json.dumps({"status": "error", "message": f"No result for this call; {outcome}."}),
+        }
+        for tool_call in tool_calls
+    ]
+
+class _SpokenReply:
+    """
+    The speech for one completion. Playback starts on the first sentence, after
+    the `after` reply (the previous speech) has finished playing, and is
+    skipped if the caller interrupted that reply: they are talking by then.
+    Text-only sessions have no synthesizer, so nothing is spoken.
+    """
+
+    def __init__(self, session, after=None):
+        self.session = session
+        self.after = after
+        self.utterance = None
+        self.task = None
+        self.skipped = False
+
+    def add(self, sentence):
+        if self.session.synthesizer is None:
+            return
+        if self.utterance is None:
+            self.utterance = self.session.synthesizer.begin()
+            self.task = asyncio.create_task(self._play())
+        self.utterance.add(sentence)
+
+    async def _play(self):
+        if self.after is not None and self.after.task is not None:
+            await self.after.task
+            if self.after.interrupted:
+                self.utterance.cancel()
+                self.skipped = True
+                return ""
+        return await self.session.play(self.utterance)
+
+    def finish(self):
+        """Marks the text as complete and returns the playback task, or None if there was nothing to say."""
+        if self.utterance is None:
+            return None
+        self.utterance.finish()
+        return self.task
+
+    @property
+    def interrupted(self):
+        """True if the caller cut in before hearing the whole reply."""
+        return self.utterance is not None and self.utterance.interrupted
+
+    def first_audio_at(self):
+        return self.utterance.first_audio_at if self.utterance is not None else None
+
+    async def cancel(self):
+        """Stops synthesis and playback and waits for the playback thread to let go of the device."""
+        if self.utterance is None:
+            return
+        self.utterance.cancel()
+        if not self.task.done():
+            await asyncio.shield(self.task)
+
+class Session:
+    """
+    One caller's conversation, run on asyncio: its history, audio endpoints and
+    timings. Everything else, including the options, comes from the shared Agent.
+    """
+
+    def __init__(self, agent, conversation_history, source=None, sink=None, barge_in=None, prefetcher=None):
+        self.agent = agent
+        self.client = agent.client
+        self.synthesizer = agent.synthesizer
+        self.conversation_history = conversation_history
+        self.source = source
+        self.sink = sink
+        self.barge_in = barge_in
+        self.prefetcher = prefetcher
+        # This call's voice activity detector, made on the first recording; its buffer holds the caller's speech.
+        self.detector = None
+        self.pending_audio = None
+        self.turn_timings = []
+        self._prompt_tokens = []
+        # Tags this call's trace spans; turn 0 is the greeting.
+        self.call_id = uuid.uuid4().hex[:12]
+        self.turns = 0
+
+    def _begin_turn(self):
+        self.turns += 1
+        tracing.set_context(self.call_id, self.turns)
+
+    async def _stage(self, name, awaitable, timings, span=None):
+        """
+        Awaits one stage under its time limit and records how long it took,
+        also as a trace span if `span` names one.
+        """
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(awaitable, self.agent.timeouts[name])
+        except asyncio.TimeoutError:
+            raise StageTimeout(name, self.agent.timeouts[name]) from None
+        finally:
+            end = time.perf_counter()
+            timings[name] = timings.get(name, 0.0) + (end - start) * 1000
+            if span is not None:
+                tracing.record(span, start, end)
+
+    async def _in_thread(self, function, *args):
+        """Runs blocking work on the agent's I/O pool, keeping this turn's trace context."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.agent.io_executor, tracing.wrap(function), *args)
+
+    def _play_blocking(self, utterance):
+        """
+        Plays an utterance, listening for interruptions in full-duplex mode.
+        Returns (heard_text, interruption) where heard_text is what the caller actually
+        heard, annotated if they cut in, and interruption is their recorded speech or None.
+        """
+        self.synthesizer.play(utterance, barge_in=self.barge_in, sink=self.sink)
+        interruption = self.barge_in.stop() if self.barge_in else None
+        if interruption is not None:
+            # The monitor reuses its buffer, so keep a copy for the next turn.
+            interruption = interruption.copy()
+        text = " ".join(utterance.texts)
+        if not utterance.interrupted:
+            return text, interruption
+        note = "[The caller interrupted here and did not hear the rest of this reply.]"
+        return f"{utterance.heard_text()} {note}".strip(), interruption
+
+    async def play(self, utterance):
+        """Plays a prepared utterance and returns what the caller heard; an interruption becomes the next turn."""
+        heard, interruption = await self._in_thread(self._play_blocking, utterance)
+        if interruption is not None:
+            self.pending_audio = interruption
+        return heard
+
+    async def speak(self, text):
+        """Synthesizes and plays `text`, returning what the caller heard."""
+        if self.synthesizer is None:
+            return text
+        return await self.play(self.synthesizer.prepare(text))
+
+    def _request_messages(self):
+        """Returns the (possibly compacted) history to send and logs its size."""
+        messages = self.conversation_history.messages()
+        tokens = self.conversation_history.last_token_count
+        self._prompt_tokens.append(tokens)
+        print(f"Prompt size: {tokens} tokens in {len(messages)} messages.")
+        return messages
+
+    async def _complete(self, on_sentence, **kwargs):
+        """
+        Requests a chat completion over the conversation so far, handing each
+        sentence of the reply to `on_sentence` as soon as it is complete.
+        Returns (content, tool_calls) with the tool calls as plain dicts.
+        """
+        if not self.agent.streaming:
+            response = await self.client.chat.completions.create(
+                model=self.agent.model, messages=self._request_messages(), timeout=request_timeout("chat"), **kwargs
+            )
+            message = response.choices[0].message
+            for sentence in split_sentences(message.content or ""):
+                on_sentence(sentence)
+            return message.content, [_tool_call_to_dict(tool_call) for tool_call in message.tool_calls or []]
+
+        stream = await self.client.chat.completions.create(
+            model=self.agent.model, messages=self._request_messages(), stream=True, timeout=request_timeout("chat"), **kwargs
+        )
+        streamer = SentenceStreamer()
+        parts = []
+        calls = {}
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                parts.append(delta.content)
+                for sentence in streamer.feed(delta.content):
+                    on_sentence(sentence)
+            # Tool calls arrive in fragments keyed by index: the id and name once,
+            # the JSON arguments spread over many chunks.
+            for fragment in delta.tool_calls or []:
+                call = calls.setdefault(fragment.index, {"id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+                if fragment.id:
+                    call["id"] = fragment.id
+                if fragment.function is not None:
+                    if fragment.function.name:
+                        call["function"]["name"] = fragment.function.name
+                    if fragment.function.arguments:
+                        call["function"]["arguments"] += fragment.function.arguments
+        for sentence in streamer.flush():
+            on_sentence(sentence)
+        return "".join(parts) or None, [calls[index] for index in sorted(calls)]
+
+    async def run_turn(self, audio_data, sample_rate):
+        """
+        Handles one caller utterance end to end.
+        Returns False when the caller ends the call, True otherwise.
+        """
+        self._begin_turn()
+        timings = {}
+        turn_start = time.perf_counter()
+        transcription = transcribe_async(audio_data, sample_rate, self.client, hedge_after=self.agent.transcribe_hedge_after)
+        user_message, _ = await self._stage("transcribe", transcription, timings)
+        print(f"You said: {user_message}")
+
+        if "goodbye" in user_message.lower():
+            print("Goodbye!")
+            return False
+
+        await self.respond(user_message, timings, turn_start)
+        return True
+
+    async def respond(self, user_message, timings=None, turn_start=None):
+        """
+        Answers one message from the caller, speaking the reply if the session
+        has a synthesizer. Returns the reply text.
+        """
+        if timings is None:
+            self._begin_turn()
+            timings = {}
+        turn_start = time.perf_counter() if turn_start is None else turn_start
+        self._prompt_tokens = timings["prompt_tokens"] = []
+        agent = self.agent
+        self.conversation_history.append({"role": "user", "content": user_message})
+        if self.prefetcher is not None:
+            self.prefetcher.observe(user_message)
+
+        answer = agent.faq_router.answer(user_message) if agent.faq_router else None
+        if answer is not None:
+            timings["faq"] = True
+            print(f"Jay (FAQ): {answer}")
+            try:
+                heard = await self.speak(answer)
+            finally:
+                self._end_turn(timings, turn_start)
+            self.conversation_history.append({"role": "assistant", "content": heard})
+            return answer
+
+        if agent.faq_index is not None:
+            retrieval_start = time.perf_counter()
+            entries = agent.faq_index.search(user_message, agent.faq_top_k)
+            # Always sent, since the system prompt tells the model to expect it.
+            self.conversation_history.context = (f"Relevant FAQ entries:\n{format_faq(entries)}" if entries
+                                                 else "Relevant FAQ entries: none matched this question.")
+            timings["faq_retrieval"] = (time.perf_counter() - retrieval_start) * 1000
+            print(f"FAQ retrieval: {len(entries)} entries in {timings['faq_retrieval']:.1f} ms.")
+
+        # Whatever the first completion says is spoken as it streams in. If it also
+        # asks for tools, that text is the interim message and the second
+        # completion's reply is queued to play after it.
+        first = _SpokenReply(self)
+        reply = None
+        try:
+            print("Sending to OpenAI...")
+            content, tool_calls = await self._stage(
+                "chat", self._complete(first.add, tools=agent.tools, tool_choice="auto"), timings, span="llm.first"
+            )
+
+            if tool_calls:
+                if content:
+                    print(f"Jay (interim): {content}")
+                interim_task = first.finish()
+                if interim_task is not None and not agent.pipelined:
+                    await interim_task
+
+                tool_call_message = {"role": "assistant", "content": content, "tool_calls": tool_calls}
+                self.conversation_history.append(tool_call_message)
+                try:
+                    tool_messages, timings["tool_calls"] = await self._stage(
+                        "tools", self._in_thread(agent.tool_executor.execute, tool_calls, self.prefetcher), timings, span="tools"
+                    )
+                except BaseException as e:
+                    # Every tool call needs a reply in the history, or each later completion is rejected.
+                    self.conversation_history.extend(_unanswered_tool_messages(tool_calls, e))
+                    raise
+                self.conversation_history.extend(tool_messages)
+
+                reply = _SpokenReply(self, after=first)
+                templated = render_reply(tool_calls, tool_messages) if agent.templated_replies else None
+                if templated is not None:
+                    # The outcome is settled by the tool result, so skip the second completion.
+                    print("Replying from the tool result template.")
+                    timings["templated"] = True
+                    for sentence in split_sentences(templated):
+                        reply.add(sentence)
+                    assistant_message = templated
+                else:
+                    assistant_message, _ = await self._stage("chat", self._complete(reply.add), timings, span="llm.second")
+            else:
+                reply = first
+                assistant_message = content
+
+            print(f"OpenAI said: {assistant_message}")
+            reply_task = reply.finish()
+            heard = await reply_task if reply_task is not None else ""
+            if first is not reply and first.task is not None:
+                interim_heard = await first.task
+                if first.interrupted:
+                    # Keep only what the caller heard of the interim message.
+                    self.conversation_history.replace(tool_call_message, {**tool_call_message, "content": interim_heard})
+            if assistant_message and not reply.skipped:
+                self.conversation_history.append({"role": "assistant", "content": heard if reply.interrupted else assistant_message})
+        except BaseException:
+            # Stop anything still synthesizing or playing before giving up on the turn.
+            for spoken in (first, reply):
+                if spoken is not None:
+                    await spoken.cancel()
+            raise
+        finally:
+            first_audio_at = first.first_audio_at() or (reply.first_audio_at() if reply else None)
+            if first_audio_at is not None:
+                timings["first_audio"] = (first_audio_at - turn_start) * 1000
+            self._end_turn(timings, turn_start)
+        return assistant_message
+
+    def _end_turn(self, timings, turn_start):
+        if self.prefetcher is not None:
+            # Another session may change the patient before the next turn.
+            self.prefetcher.invalidate()
+        end = time.perf_counter()
+        timings["total"] = (end - turn_start) * 1000
+        self.turn_timings.append(timings)
+        tracing.record("turn", turn_start, end, faq=timings.get("faq", False),
+                       templated=timings.get("templated", False), first_audio_ms=timings.get("first_audio"))
+
+    async def next_utterance(self):
+        """Returns the caller's next utterance: a pending interruption or a fresh recording."""
+        if self.pending_audio is not None:
+            # The caller interrupted the last reply; their words are the next turn.
+            audio_data, self.pending_audio = self.pending_audio, None
+            return audio_data, self.source.fs
+        # Listening belongs to the turn it starts.
+        tracing.set_context(self.call_id, self.turns + 1)
+        if self.detector is None:
+            self.detector = detector_for(self.source)
+        return await self._in_thread(record_audio, self.source, self.detector)
+
+    async def greet(self, greeting):
+        """Speaks the greeting and records it as the first message of the call."""
+        tracing.set_context(self.call_id, 0)
+        print(f"\nJay: {greeting}")
+        try:
+            heard = await self.speak(greeting)
+        except Exception as e:
+            heard = greeting
+            print(f"An error occurred during the initial greeting: {e}")
+        self.conversation_history.append({"role": "assistant", "content": heard})
+
+    async def run(self, greeting):
+        """Greets the caller and runs turns until they hang up or the audio runs out."""
+        await self.greet(greeting)
+
+        while True:
+            try:
+                audio_data, sample_rate = await self.next_utterance()
+            except EndOfAudio:
+                print("End of the recorded call.")
+                break
+
+            if audio_data.size == 0:
+                print("No audio recorded, listening again.")
+                continue
+
+            try:
+                if not await self.run_turn(audio_data, sample_rate):
+                    break
+            except StageTimeout as e:
+                print(e)
+                await self.speak(RETRY_PHRASE if e.stage == "transcribe" else ERROR_PHRASE)
+            except Exception as e:
+                print(f"An error occurred: {e}")
@@ -1,8 +1,11 @@
 import sqlite3
 from thefuzz import process
+from insurance_index import insurance_index
 from datetime import datetime, timedelta
 import pytz
 import re
+from db_pool import DATABASE_PATH, connect
+from migrations import migrate
 from email_notifications import send_appointment_confirmation
 
 # Define the clinic's timezone
@@ -30,6 +33,16 @@ def _correct_and_validate_email(email):
         # Return the original email in the error message
         return email, False, f"The provided email '{email}' is not in a valid format. Please provide a valid email address (e.g., name@example.com)."
 
+def assign_doctor(illness):
+    """
+    Returns the doctor who treats `illness`: Dr. Jonas for ACL and joint pain,
+    Dr. Katherine for everything else.
+    """
+    illness_lower = illness.lower()
+    if 'acl' in illness_lower or 'joint pain' in illness_lower:
+        return 'Dr. Jonas'
+    return 'Dr. Katherine'
+
 def is_valid_appointment_datetime(appointment_date, appointment_time):
     """
     Validates the appointment date and time against clinic rules.
@@ -65,32 +78,6 @@ def is_valid_appointment_datetime(appointment_date, appointment_time):
     except ValueError:
         return False, "Invalid time or date format. Please use HH:MM for time and YYYY-MM-DD for date."
 
-def populate_insurance_data(con):
-    """
-    Populates the Insurance table with the provided data.
-    """
-    cur = con.cursor()
-    insurance_data = [
-        (1, 'Aetna', 1, 'Cardiology, Diabetes, Cancer, Orthopedics, Pediatrics'),
-        (2, 'Blue Cross Blue Shield', 1, 'General, Heart Disease, Mental Health, Orthopedics, Respiratory Disorders'),
-        (3, 'UnitedHealthcare', 1, 'Diabetes, Hypertension, Cardiology, Maternity, Pediatrics'),
-        (4, 'Cigna', 1, 'Oncology, Cardiology, Dermatology, Gastroenterology'),
-        (5, 'Humana', 0, 'Diabetes, Cancer, Kidney Disorders, Vision & Dental'),
-        (6, 'Kaiser Permanente', 1, 'Pediatrics, Cardiology, Diabetes, Preventive Care'),
-        (7, 'Allianz Care', 1, 'Global Health, Critical Illness, Mental Health, Maternity'),
-        (8, 'Prudential Health', 1, 'Cancer, Diabetes, Cardiology, Orthopedics, Chronic Illness'),
-        (9, 'Manulife', 1, 'Diabetes, Heart Disease, Stroke, Cancer, General Care'),
-        (10, 'ICICI Lombard (India)', 1, 'Cancer, Diabetes, Cardiology, COVID-19, Critical Illness'),
-        (11, 'HDFC ERGO Health (India)', 1, 'Orthopedics, Maternity, Cancer, Diabetes, Neurology'),
-        (12, 'Star Health (India)', 1, 'Pediatrics, Diabetes, Heart Disease, Cancer, Maternity'),
-        (13, 'Max Bupa (Niva Bupa, India)', 1, 'Cancer, Diabetes, Cardiology, Pediatrics, Respiratory Disorders'),
-        (14, 'Religare Care (Care Health)', 1, 'Diabetes, Cancer, Stroke, Heart Disease, Critical Illness'),
-        (15, 'New India Assurance', 1, 'General, Cancer, Diabetes, Heart Disease, Neurological Disorders')
-    ]
-    cur.executemany("INSERT INTO Insurance VALUES (?, ?, ?, ?)", insurance_data)
-    con.commit()
-    print("Insurance table populated with 15 records.")
-
 def find_existing_patient(con, patient_name, phone_number):
     """
     Finds an existing patient by phone number and fuzzy name matching.
@@ -142,16 +129,8 @@ def add_patient(con, patient_name, phone_number, patient_email, illness, insuran
 
     # Find the insurance ID using fuzzy matching
     cur = con.cursor()
-    cur.execute("SELECT InsuranceName FROM Insurance")
-    all_insurance_names = [row[0] for row in cur.fetchall()]
-    best_match, score = process.extractOne(insurance_name, all_insurance_names)
-    
-    insurance_id = None
-    if score >= 80:
-        cur.execute("SELECT InsuranceId FROM Insurance WHERE InsuranceName = ?", (best_match,))
-        result = cur.fetchone()
-        if result:
-            insurance_id = result[0]
+    payer, _ = insurance_index(con).match(insurance_name)
+    insurance_id = payer["insurance_id"] if payer else None
 
     # Insert the new patient record
     try:
@@ -170,38 +149,59 @@ def add_patient(con, patient_name, phone_number, patient_email, illness, insuran
         print(f"Database insert error: {e}")
         return {"status": "error", "message": "Failed to add new patient."}
 
+def load_patient_record(con, patient_email):
+    """
+    Returns the patient with this (already validated) email as a dict with their
+    id, name, email and upcoming appointments, or None if there is no such patient.
+    """
+    cur = con.cursor()
+    cur.execute("SELECT PatientId, PatientName, PatientEmail FROM Patients WHERE PatientEmail = ?", (patient_email,))
+    patient = cur.fetchone()
+    if not patient:
+        return None
+
+    now = datetime.now(TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+    cur.execute(
+        "SELECT AppointmentId, DoctorName, AppointmentTimeStart FROM Appointments WHERE PatientId = ? AND AppointmentTimeStart >= ? ORDER BY AppointmentTimeStart",
+        (patient[0], now)
+    )
+    upcoming = []
+    for appointment_id, doctor_name, start in cur.fetchall():
+        start_time = datetime.strptime(start, '%Y-%m-%d %H:%M:%S')
+        upcoming.append({
+            "appointment_id": appointment_id,
+            "doctor_name": doctor_name,
+            "appointment_date": start_time.strftime('%Y-%m-%d'),
+            "appointment_time": start_time.strftime('%H:%M'),
+        })
+    return {"patient_id": patient[0], "patient_name": patient[1], "patient_email": patient[2], "upcoming_appointments": upcoming}
+
+def patient_details_result(record):
+    """Turns a record from load_patient_record() into get_patient_details' result."""
+    if record is None:
+        return {
+            "status": "not_found",
+            "message": "No patient record was found with these details. You can proceed with creating a new record if needed."
+        }
+    return {
+        "status": "found",
+        "patient_id": record["patient_id"],
+        "patient_name": record["patient_name"],
+        "upcoming_appointments": record["upcoming_appointments"],
+        "message": f"Patient record found for {record['patient_name']}."
+    }
+
 def get_patient_details(con, patient_name, patient_email):
     """
-    Finds a patient by email and returns their non-sensitive details.
+    Finds a patient by email and returns their non-sensitive details and upcoming appointments.
     """
     # 0. Validate the email before querying
     patient_email, is_valid, message = _correct_and_validate_email(patient_email)
     if not is_valid:
         return {"status": "error", "message": message}
 
-    patient_id = find_existing_patient_by_email(con, patient_email)
-    
-    if not patient_id:
-        return {
-            "status": "not_found",
-            "message": "No patient record was found with these details. You can proceed with creating a new record if needed."
-        }
-    
     try:
-        cur = con.cursor()
-        cur.execute("SELECT PatientName FROM Patients WHERE PatientId = ?", (patient_id,))
-        result = cur.fetchone()
-        
-        if not result:
-            # This is unlikely if find_existing_patient worked, but good for safety
-            return {"status": "error", "message": "Found patient ID but could not retrieve details."}
-            
-        return {
-            "status": "found",
-            "patient_id": patient_id,
-            "patient_name": result[0],
-            "message": f"Patient record found for {result[0]}."
-        }
+        return patient_details_result(load_patient_record(con, patient_email))
 
     except sqlite3.Error as e:
         print(f"Database query error: {e}")
@@ -217,11 +217,7 @@ def check_availability(con, appointment_date, appointment_time, illness):
         return {"status": "error", "message": message}
 
     # 1. Assign doctor based on illness
-    illness_lower = illness.lower()
-    if 'acl' in illness_lower or 'joint pain' in illness_lower:
-        doctor_name = 'Dr. Jonas'
-    else:
-        doctor_name = 'Dr. Katherine'
+    doctor_name = assign_doctor(illness)
 
     # 2. Format the time string for querying
     try:
@@ -239,13 +235,118 @@ def check_availability(con, appointment_date, appointment_time, illness):
             (doctor_name, start_time_str)
         )
         if cur.fetchone():
-            return {"status": "unavailable", "doctor_name": doctor_name, "message": f"The slot at {appointment_time} with {doctor_name} is already booked."}
+            return {"status": "unavailable", "doctor_name": doctor_name, "message": f"The slot at {appointment_time} with {doctor_name} is already booked.",
+                    "suggested_slots": _suggested_slots(con, doctor_name, appointment_date, appointment_time)}
         else:
             return {"status": "available", "doctor_name": doctor_name, "message": f"The slot at {appointment_time} with {doctor_name} is available."}
     except sqlite3.Error as e:
         print(f"Database availability check error: {e}")
         return {"status": "error", "message": "A database error occurred while checking availability."}
 
+# The appointment grid is_valid_appointment_datetime() allows: weekdays, every
+# 30 minutes from 08:00 to 16:30. A day's bookings for one doctor fit in an
+# int with one bit per slot (bit 0 is 08:00).
+SLOT_MINUTES = 30
+FIRST_SLOT_MINUTE = 8 * 60
+SLOTS_PER_DAY = 18
+ALL_SLOTS = (1 << SLOTS_PER_DAY) - 1
+
+def _slot_index(hour, minute):
+    """Returns the grid slot a start time falls in, or None if it is outside clinic hours."""
+    index = (hour * 60 + minute - FIRST_SLOT_MINUTE) // SLOT_MINUTES
+    return index if 0 <= index < SLOTS_PER_DAY else None
+
+def _occupancy(con, doctor_name, first_day, end_day):
+    """
+    Returns {"YYYY-MM-DD": bitmap of booked slots} for the doctor's days from
+    `first_day` up to, not including, `end_day`, read with a single range query.
+    """
+    cur = con.cursor()
+    cur.execute(
+        "SELECT AppointmentTimeStart FROM Appointments WHERE DoctorName = ? AND AppointmentTimeStart >= ? AND AppointmentTimeStart < ?",
+        (doctor_name, first_day.strftime('%Y-%m-%d 00:00:00'), end_day.strftime('%Y-%m-%d 00:00:00'))
+    )
+    booked = {}
+    for (start,) in cur.fetchall():
+        # Stored as 'YYYY-MM-DD HH:MM:SS'; slicing is much cheaper than strptime here.
+        index = _slot_index(int(start[11:13]), int(start[14:16]))
+        if index is not None:
+            day = start[:10]
+            booked[day] = booked.get(day, 0) | (1 << index)
+    return booked
+
+def _free_slots(con, doctor_name, start, days, n):
+    """
+    Returns up to `n` free slots for the doctor as {"appointment_date", "appointment_time"}
+    dicts, earliest first, from the naive datetime `start` (or now, if later) over `days` days.
+    """
+    now = datetime.now(TIMEZONE).replace(tzinfo=None)
+    start = max(start, now)
+    first_day = start.date()
+    booked = _occupancy(con, doctor_name, first_day, first_day + timedelta(days=days))
+
+    slots = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        day_text = day.strftime('%Y-%m-%d')
+        free = ALL_SLOTS & ~booked.get(day_text, 0)
+        if offset == 0:
+            # Drop the slots that start before `start` on its own day.
+            minutes = start.hour * 60 + start.minute - FIRST_SLOT_MINUTE
+            first_free = max(0, -(-minutes // SLOT_MINUTES))
+            free &= ~((1 << min(first_free, SLOTS_PER_DAY)) - 1)
+        while free and len(slots) < n:
+            lowest = free & -free
+            index = lowest.bit_length() - 1
+            free ^= lowest
+            minute = FIRST_SLOT_MINUTE + index * SLOT_MINUTES
+            slots.append({"appointment_date": day_text, "appointment_time": f"{minute // 60:02d}:{minute % 60:02d}"})
+        if len(slots) >= n:
+            break
+    return slots
+
+def find_available_slots(con, illness, from_date=None, days=14, n=5):
+    """
+    Finds the next `n` free appointment slots with the doctor for `illness`,
+    searching `days` days from `from_date` (today if not given).
+    """
+    try:
+        if from_date:
+            start = datetime.strptime(from_date, '%Y-%m-%d')
+        else:
+            start = datetime.now(TIMEZONE).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return {"status": "error", "message": "Invalid date format. Please use YYYY-MM-DD."}
+    try:
+        days = max(1, min(int(days or 14), 90))
+        n = max(1, min(int(n or 5), 20))
+    except (TypeError, ValueError):
+        return {"status": "error", "message": "Invalid search range. days and n must be whole numbers."}
+    doctor_name = assign_doctor(illness)
+
+    try:
+        slots = _free_slots(con, doctor_name, start, days, n)
+    except sqlite3.Error as e:
+        print(f"Database slot search error: {e}")
+        return {"status": "error", "message": "A database error occurred while looking for free slots."}
+
+    if not slots:
+        return {"status": "none_available", "doctor_name": doctor_name, "slots": [],
+                "message": f"{doctor_name} has no free slots in the {days} days from {start:%Y-%m-%d}."}
+    return {"status": "available", "doctor_name": doctor_name, "slots": slots,
+            "message": f"Found {len(slots)} free slots with {doctor_name}."}
+
+def _suggested_slots(con, doctor_name, appointment_date, appointment_time, n=3):
+    """Free slots with the doctor after a taken one, for conflict responses; empty if the search fails."""
+    try:
+        start = datetime.strptime(f"{appointment_date} {appointment_time}", '%Y-%m-%d %H:%M')
+        return _free_slots(con, doctor_name, start, 14, n)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Could not suggest other slots: {e}")
+        return []
+
 def cancel_appointment(con, patient_id, appointment_date, appointment_time):
     """
     Cancels an existing appointment for a given patient at a specific time.
@@ -310,18 +411,12 @@ def update_patient(con, patient_id, new_phone_number=None, new_insurance_name=No
     try:
         cur = con.cursor()
 
-        # Prepare the insurance update if provided (requires a DB lookup).
+        # Prepare the insurance update if provided.
         if new_insurance_name:
-            cur.execute("SELECT InsuranceName FROM Insurance")
-            all_insurance_names = [row[0] for row in cur.fetchall()]
-            best_match, score = process.extractOne(new_insurance_name, all_insurance_names)
-            
-            if score >= 80:
-                cur.execute("SELECT InsuranceId FROM Insurance WHERE InsuranceName = ?", (best_match,))
-                result = cur.fetchone()
-                if result:
-                    updates.append("InsuranceId = ?")
-                    params.append(result[0])
+            payer, _ = insurance_index(con).match(new_insurance_name)
+            if payer:
+                updates.append("InsuranceId = ?")
+                params.append(payer["insurance_id"])
             else:
                 # If the insurance name is not found, return an error instead of proceeding.
                 return {"status": "validation_error", "message": f"The insurance provider '{new_insurance_name}' was not found in our system."}
@@ -346,10 +441,12 @@ def update_patient(con, patient_id, new_phone_number=None, new_insurance_name=No
         print(f"Database update error: {e}")
         return {"status": "error", "message": "A database error occurred during the update."}
 
-def book_appointment(con, patient_id, appointment_date, appointment_time, illness):
+def book_appointment(con, patient_id, appointment_date, appointment_time, illness, patient_contact=None):
     """
     Books an appointment for a patient, handling all validation and conflict checking.
     This function is a single, atomic operation for booking.
+    `patient_contact` is the patient's (email, name) if the caller already has it,
+    which saves looking it up for the confirmation email.
     """
     # Step 1: Centralized, strict validation of the requested date and time.
     is_valid, message = is_valid_appointment_datetime(appointment_date, appointment_time)
@@ -358,11 +455,7 @@ def book_appointment(con, patient_id, appointment_date, appointment_time, illnes
         return {"status": "validation_error", "message": message}
 
     # Step 2: Assign the correct doctor based on the patient's illness.
-    illness_lower = illness.lower()
-    if 'acl' in illness_lower or 'joint pain' in illness_lower:
-        doctor_name = 'Dr. Jonas'
-    else:
-        doctor_name = 'Dr. Katherine'
+    doctor_name = assign_doctor(illness)
 
     # Step 3: Format date and time strings for database insertion.
     try:
@@ -385,7 +478,8 @@ def book_appointment(con, patient_id, appointment_date, appointment_time, illnes
         )
         if cur.fetchone():
             conflict_message = f"Sorry, {doctor_name} is already booked at that time. Please choose another slot."
-            return {"status": "conflict", "message": conflict_message}
+            return {"status": "conflict", "message": conflict_message,
+                    "suggested_slots": _suggested_slots(con, doctor_name, appointment_date, appointment_time)}
 
         # Insert the new appointment record.
         cur.execute(
@@ -401,13 +495,16 @@ def book_appointment(con, patient_id, appointment_date, appointment_time, illnes
         print("SYSTEM: Triggering email confirmation...")
         print("---\n")
         
-        # Fetch patient details for the confirmation email.
-        cur.execute("SELECT PatientEmail, PatientName FROM Patients WHERE PatientId = ?", (patient_id,))
-        patient_info = cur.fetchone()
+        # Fetch patient details for the confirmation email, unless they were passed in.
+        patient_info = patient_contact
+        if patient_info is None:
+            cur.execute("SELECT PatientEmail, PatientName FROM Patients WHERE PatientId = ?", (patient_id,))
+            patient_info = cur.fetchone()
         
+        email_sent = False
         if patient_info:
             patient_email, patient_name = patient_info
-            send_appointment_confirmation(
+            email_sent = send_appointment_confirmation(
                 patient_email=patient_email,
                 patient_name=patient_name,
                 doctor_name=doctor_name,
@@ -423,9 +520,15 @@ def book_appointment(con, patient_id, appointment_date, appointment_time, illnes
             "appointment_id": appointment_id,
             "doctor_name": doctor_name,
             "time": appointment_time,
+            "confirmation_email_sent": email_sent,
             "message": f"Appointment successfully booked with {doctor_name} at {appointment_time}."
         }
 
+    except sqlite3.IntegrityError:
+        # Another connection took the slot between the conflict check and the insert.
+        con.rollback()
+        return {"status": "conflict", "message": f"Sorry, {doctor_name} is already booked at that time. Please choose another slot.",
+                "suggested_slots": _suggested_slots(con, doctor_name, appointment_date, appointment_time)}
     except sqlite3.Error as e:
         print(f"Database appointment booking error: {e}")
         return {"status": "error", "message": "A database error occurred while booking the appointment."}
@@ -460,7 +563,8 @@ def reschedule_appointment(con, patient_id, old_appointment_date, old_appointmen
         # 2. Check availability for the new slot with the same doctor
         availability_result = check_availability(con, new_appointment_date, new_appointment_time, illness)
         if availability_result["status"] != "available":
-            return {"status": "conflict", "message": f"The new time slot is not available. Reason: {availability_result['message']}"}
+            return {"status": "conflict", "message": f"The new time slot is not available. Reason: {availability_result['message']}",
+                    "suggested_slots": availability_result.get("suggested_slots", [])}
 
         # 3. The new slot is available, so proceed with rescheduling.
         # This involves deleting the old appointment and booking the new one.
@@ -489,7 +593,7 @@ def reschedule_appointment(con, patient_id, old_appointment_date, old_appointmen
         print("---\n")
         
         # Send confirmation email for the new appointment
-        send_appointment_confirmation(
+        email_sent = send_appointment_confirmation(
             patient_email=patient_email,
             patient_name=patient_name,
             doctor_name=doctor_name,
@@ -499,9 +603,15 @@ def reschedule_appointment(con, patient_id, old_appointment_date, old_appointmen
 
         return {
             "status": "success",
+            "confirmation_email_sent": email_sent,
             "message": f"Your appointment has been successfully rescheduled to {new_appointment_date} at {new_appointment_time} with {doctor_name}."
         }
 
+    except sqlite3.IntegrityError:
+        # The new slot was taken after the availability check; keep the original appointment.
+        con.rollback()
+        return {"status": "conflict", "message": "The new time slot is not available. Reason: it was just booked by someone else.",
+                "suggested_slots": _suggested_slots(con, doctor_name, new_appointment_date, new_appointment_time)}
     except sqlite3.Error as e:
         con.rollback() # Roll back any changes if an error occurs
         print(f"Database rescheduling error: {e}")
@@ -514,31 +624,17 @@ def check_insurance_coverage(con, insurance_name):
     Queries the database to check for insurance coverage, using fuzzy matching for the provider name.
     """
     try:
-        cur = con.cursor()
-        
-        # Get all insurance names from the database
-        cur.execute("SELECT InsuranceName FROM Insurance")
-        all_insurance_names = [row[0] for row in cur.fetchall()]
-
         # Find the best match for the provided insurance name
-        best_match, score = process.extractOne(insurance_name, all_insurance_names)
+        payer, _ = insurance_index(con).match(insurance_name)
 
         # If the match score is low, assume it's not a valid name
-        if score < 80:
+        if payer is None:
             return {
                 "status": "not_found",
                 "message": "This insurance provider is not in our list. However, we can still proceed with scheduling an appointment."
             }
-        
-        # Query the database using the best match
-        cur.execute("SELECT InsuranceName, IsSupported, DiseasesCovered FROM Insurance WHERE InsuranceName = ?", (best_match,))
-        result = cur.fetchone()
 
-        if not result:
-            # This should ideally not happen if the fuzzy match is working correctly
-            return {"status": "error", "message": "Could not retrieve details for the matched insurance."}
-
-        name, is_supported, diseases_covered = result
+        name, is_supported, diseases_covered = payer["name"], payer["is_supported"], payer["diseases_covered"]
         
         if not is_supported:
             return {
@@ -569,59 +665,14 @@ def check_insurance_coverage(con, insurance_name):
 
 def initialize_database():
     """
-    Initializes a SQLite database file and creates the necessary tables.
+    Opens the SQLite database file in WAL mode, creating it if needed, and
+    applies any schema migrations it has not had yet (see migrations.py).
     Returns the database connection object.
     """
     try:
-        # Create a database file
-        con = sqlite3.connect("clinic_data.db", check_same_thread=False)
-        cur = con.cursor()
-
-        # Check if tables already exist to avoid re-populating
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='Insurance'")
-        if cur.fetchone() is None:
-            # Create the Insurance table first
-            cur.execute("""
-                CREATE TABLE Insurance (
-                    InsuranceId INTEGER PRIMARY KEY,
-                    InsuranceName TEXT NOT NULL,
-                    IsSupported INTEGER NOT NULL, -- Using 1 for Yes, 0 for No
-                    DiseasesCovered TEXT
-                )
-            """)
-
-            # Create the Patients table
-            cur.execute("""
-                CREATE TABLE Patients (
-                    PatientId INTEGER PRIMARY KEY AUTOINCREMENT,
-                    PatientName TEXT,
-                    PatientPhoneNumber TEXT,
-                    PatientEmail TEXT UNIQUE,
-                    PatientIllness TEXT,
-                    InsuranceId INTEGER,
-                    FOREIGN KEY (InsuranceId) REFERENCES Insurance(InsuranceId)
-                )
-            """)
-
-            # Create the Appointments table
-            cur.execute("""
-                CREATE TABLE Appointments (
-                    AppointmentId INTEGER PRIMARY KEY AUTOINCREMENT,
-                    AppointmentTimeStart TEXT,
-                    AppointmentTimeEnd TEXT,
-                    DoctorName TEXT,
-                    PatientId INTEGER,
-                    FOREIGN KEY (PatientId) REFERENCES Patients(PatientId)
-                )
-            """)
-            
-            # Populate the insurance table with initial data
-            populate_insurance_data(con)
-            print("Database created and insurance data populated.")
-        else:
-            print("Database file already exists. Skipping table creation.")
-        
-        print("SQLite database initialized successfully.")
+        con = connect(DATABASE_PATH)
+        version = migrate(con)
+        print(f"SQLite database initialized successfully (schema version {version}).")
         return con
 
     except sqlite3.Error as e:
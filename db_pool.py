@@ -0,0 +1,63 @@
+import sqlite3
+import threading
+import tracing
+
+DATABASE_PATH = "clinic_data.db"
+
+# Settings for every connection. In WAL mode readers never wait for a writer (or
+# a writer for readers), and synchronous=NORMAL then only syncs at checkpoints:
+# still safe against corruption, though a power cut can lose the last commits.
+# A connection that does find the database locked waits up to BUSY_TIMEOUT
+# seconds instead of failing with "database is locked".
+JOURNAL_MODE = "WAL"
+BUSY_TIMEOUT = 5.0
+MMAP_SIZE = 64 * 1024 * 1024
+# Prepared statements kept per connection; the tools use a few dozen distinct ones.
+CACHED_STATEMENTS = 256
+
+def connect(path=DATABASE_PATH, read_only=False, journal_mode=JOURNAL_MODE, check_same_thread=False):
+    """
+    Opens a configured, traced connection. Read-only connections cannot change
+    the database, which suits analytics and the read-only tools; they leave the
+    journal mode to the writers, since it is a property of the file.
+    """
+    target, uri = (f"file:{path}?mode=ro", True) if read_only else (path, False)
+    con = sqlite3.connect(target, uri=uri, timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread,
+                          cached_statements=CACHED_STATEMENTS, factory=tracing.TracedConnection)
+    if not read_only:
+        con.execute(f"PRAGMA journal_mode = {journal_mode}")
+    con.execute("PRAGMA synchronous = NORMAL")
+    con.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    return con
+
+class ConnectionPool:
+    """
+    Hands out one connection per thread, opened with connect() on first use and
+    kept for the thread's lifetime, so threads never share a connection (or its
+    transaction) and never pay to reopen one. close() closes them all.
+    """
+
+    def __init__(self, path=DATABASE_PATH, read_only=False, journal_mode=JOURNAL_MODE):
+        self.path = path
+        self.read_only = read_only
+        self.journal_mode = journal_mode
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def connection(self):
+        """Returns the calling thread's connection."""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = connect(self.path, read_only=self.read_only, journal_mode=self.journal_mode)
+            self._local.con = con
+            with self._lock:
+                self._connections.append(con)
+        return con
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for con in connections:
+            con.close()
+        self._local = threading.local()
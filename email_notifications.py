@@ -1,25 +1,44 @@
 import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+import threading
 from dotenv import load_dotenv
 from datetime import datetime
+import tracing
 
 # Load environment variables from .env file, so this module is self-contained
 load_dotenv()
 
+# Seconds to wait on SendGrid before giving up on a confirmation email.
+SENDGRID_TIMEOUT = 10
+
+_sendgrid_clients = {}
+_sendgrid_lock = threading.Lock()
+
+def get_sendgrid_client(api_key):
+    """Returns the process-wide SendGrid client for `api_key`, building it on first use."""
+    with _sendgrid_lock:
+        sg = _sendgrid_clients.get(api_key)
+        if sg is None:
+            # SendGrid is slow to import and only needed once a booking is confirmed.
+            from sendgrid import SendGridAPIClient
+            sg = _sendgrid_clients[api_key] = SendGridAPIClient(api_key)
+            sg.client.timeout = SENDGRID_TIMEOUT
+        return sg
+
 def send_appointment_confirmation(patient_email, patient_name, doctor_name, appointment_date, appointment_time):
     """
     Sends a confirmation email to the patient using a SendGrid dynamic template.
+    Returns True if SendGrid accepted the email.
     """
     # Ensure the SendGrid API key is set in the environment variables
     sendgrid_api_key = os.getenv("SENDGRID_API_KEY")
     if not sendgrid_api_key:
         print("Warning: SENDGRID_API_KEY not found. Skipping email notification.")
-        return
+        return False
 
     # IMPORTANT: This must be the email address you verified in your SendGrid account.
     from_email = "2023hb21247@wilp.bits-pilani.ac.in"
 
+    from sendgrid.helpers.mail import Mail
     message = Mail(
         from_email=from_email,
         to_emails=patient_email)
@@ -52,11 +71,14 @@ def send_appointment_confirmation(patient_email, patient_name, doctor_name, appo
     }
 
     try:
-        sg = SendGridAPIClient(sendgrid_api_key)
-        response = sg.send(message)
+        sg = get_sendgrid_client(sendgrid_api_key)
+        with tracing.span("email.send"):
+            response = sg.send(message)
         print(f"Confirmation email sent to {patient_email}. Status code: {response.status_code}")
+        return 200 <= response.status_code < 300
     except Exception as e:
         print(f"Error sending confirmation email: {e}")
+        return False
 
 if __name__ == '__main__':
     # A simple test to send a sample email.
@@ -0,0 +1,149 @@
+import csv
+import re
+import time
+import numpy as np
+from thefuzz import fuzz, process
+
+# Stands in for the FAQ in the system prompt when entries are retrieved per turn instead.
+RETRIEVED_FAQ_NOTE = "The FAQ entries most relevant to the caller's latest message are provided in a separate system message."
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Greetings and fillers callers put before a question ("Okay, and where are you located?").
+_LEADING_FILLERS = re.compile(
+    r"^(?:(?:hi|hello|hey|um+|uh+|so|okay|ok|oh|and|also|great|thanks|thank you|yes|yeah|sorry)\b[\s,.!]*)+",
+    re.IGNORECASE,
+)
+
+# Words too common to say anything about which entry is relevant.
+_STOP_WORDS = frozenset(
+    "a an and are at be can do does for how i in is it me my of on or the to we what when where who with you your "
+    "yes no ok okay please thanks thank hi hello".split()
+)
+
+def _terms(text):
+    return [term for term in _TOKEN.findall(text.lower()) if term not in _STOP_WORDS]
+
+def load_faq(path="faq.csv"):
+    """Reads the FAQ file into a list of {"category", "question", "answer"} dicts."""
+    with open(path, 'r', newline='') as f:
+        return [
+            {"category": row["category"], "question": row["question"], "answer": row["answer"]}
+            for row in csv.DictReader(f)
+        ]
+
+def format_faq(entries):
+    """Formats entries the way the system prompt presents the FAQ."""
+    return "\n\n".join(f"Q: {entry['question']}\nA: {entry['answer']}" for entry in entries)
+
+class FAQIndex:
+    """
+    A BM25 index over the FAQ, built once at startup, so each request carries
+    only the few entries relevant to the caller's question instead of the whole
+    FAQ.
+
+    The index is stored as postings: for every term, the ids of the entries
+    containing it and their precomputed BM25 weights, held in flat NumPy
+    arrays. Scoring a query touches only the postings of its terms, so lookups
+    stay fast as the FAQ grows.
+    """
+
+    def __init__(self, entries, k1=1.5, b=0.75):
+        self.entries = list(entries)
+        documents = [_terms(f"{entry['question']} {entry['question']} {entry['answer']}") for entry in self.entries]
+        lengths = np.array([len(terms) for terms in documents], dtype=np.float32)
+        average_length = lengths.mean() if len(documents) else 1.0
+
+        postings = {}
+        for doc_id, terms in enumerate(documents):
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((doc_id, count))
+
+        self._offsets = {}
+        doc_ids = []
+        weights = []
+        position = 0
+        for term, docs in postings.items():
+            ids = np.array([doc_id for doc_id, _ in docs], dtype=np.int32)
+            tf = np.array([count for _, count in docs], dtype=np.float32)
+            idf = np.log(1 + (len(documents) - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = k1 * (1 - b + b * lengths[ids] / average_length)
+            self._offsets[term] = (position, position + len(docs))
+            position += len(docs)
+            doc_ids.append(ids)
+            weights.append(idf * tf * (k1 + 1) / (tf + norm))
+        self._doc_ids = np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int32)
+        self._weights = np.concatenate(weights).astype(np.float32) if weights else np.zeros(0, dtype=np.float32)
+
+    def search(self, text, k=3):
+        """Returns up to `k` entries relevant to `text`, best first. Entries sharing no terms are never returned."""
+        scores = np.zeros(len(self.entries), dtype=np.float32)
+        for term in set(_terms(text)):
+            span = self._offsets.get(term)
+            if span is not None:
+                start, end = span
+                scores[self._doc_ids[start:end]] += self._weights[start:end]
+        if k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self.entries[i] for i in top if scores[i] > 0]
+
+class FAQRouter:
+    """
+    Answers FAQ questions locally when the caller's words closely match one.
+
+    Each FAQ question can come with `phrasings`, other ways callers ask it
+    ("Where are you located?" for "Where is Stemmee Surgery Center located?"),
+    since questions asked in other words score too low to route safely.
+    Matching uses thefuzz's token sort ratio against the questions and their
+    phrasings, after dropping leading greetings and fillers. It is strict
+    enough that a caller giving their phone number is not mistaken for one
+    asking for ours. Only matches scoring at least `threshold` (0-100) are
+    answered; everything else goes to the model as before. Questions listed in
+    `excluded` are never answered locally.
+    """
+
+    def __init__(self, entries, threshold=85, excluded=(), phrasings=None):
+        self.threshold = threshold
+        self._answers = {entry["question"]: entry["answer"] for entry in entries if entry["question"] not in excluded}
+        # Every phrasing that can be matched, mapped to its FAQ question.
+        self._questions = {question: question for question in self._answers}
+        for question, alternatives in (phrasings or {}).items():
+            if question in self._answers:
+                self._questions.update((alternative, question) for alternative in alternatives)
+        self.queries = 0
+        self.hits = 0
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.queries if self.queries else 0.0
+
+    def match(self, text):
+        """Returns (question, score) for the FAQ question `text` is closest to, or (None, 0)."""
+        text = _LEADING_FILLERS.sub("", text.strip())
+        if not self._questions or not text:
+            return None, 0
+        phrasing, score = process.extractOne(text, list(self._questions), scorer=fuzz.token_sort_ratio)
+        return self._questions[phrasing], score
+
+    def answer(self, text):
+        """Returns the FAQ answer for `text`, or None if no question matches confidently."""
+        start = time.perf_counter()
+        question, score = self.match(text)
+        if question is None:
+            return None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.queries += 1
+        hit = score >= self.threshold
+        if hit:
+            self.hits += 1
+        outcome = "answered locally" if hit else "passed to the model"
+        print(f"FAQ router: '{question}' scored {score} (threshold {self.threshold}) in {elapsed_ms:.1f} ms, {outcome}. "
+              f"Hit rate {self.hits}/{self.queries}.")
+        return self._answers[question] if hit else None
@@ -0,0 +1,217 @@
+import json
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:
+    # tiktoken is optional; without it tokens are estimated at ~4 characters each.
+    _ENCODING = None
+
+# Overhead the chat format adds around every message.
+_TOKENS_PER_MESSAGE = 4
+
+# Tool result fields worth remembering once the full result has been compacted away.
+_FACT_FIELDS = ("patient_id", "patient_name", "appointment_id", "doctor_name", "time", "name")
+
+# Share of the token budget the facts note may take; beyond it the oldest facts are dropped.
+_FACTS_BUDGET_SHARE = 0.25
+
+def count_tokens(text):
+    """Counts (or estimates) the tokens in a piece of text."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return len(text) // 4 + 1
+
+def message_tokens(message):
+    """Counts the tokens a message contributes to a request."""
+    tokens = _TOKENS_PER_MESSAGE + count_tokens(message.get("content") or "")
+    for tool_call in message.get("tool_calls") or []:
+        tokens += count_tokens(tool_call["function"]["name"]) + count_tokens(tool_call["function"]["arguments"])
+    return tokens
+
+def to_message_dict(message):
+    """Turns SDK message objects into plain, JSON-serializable dicts."""
+    if isinstance(message, dict):
+        return message
+    return message.model_dump(exclude_none=True)
+
+class ConversationHistory:
+    """
+    The messages of one call, kept within a token budget.
+
+    The system prompt and the most recent turns are always sent verbatim, with
+    the transient `context` (such as retrieved FAQ entries) placed right after
+    the latest user message rather than ahead of the turns. When
+    the conversation grows past the budget, older turns lose their tool calls
+    and results, which are reduced to one-line facts (patient ids, booked slots,
+    insurance matches) collected in a system note, one per tool call with the
+    latest result winning, and the oldest dropped once the note outgrows a
+    quarter of the budget. If that is still not enough, the oldest turns are
+    dropped, keeping their facts.
+
+    `system_prompt` may be a string or a callable returning one (such as a
+    PromptBuilder), which is called before every request.
+    """
+
+    def __init__(self, system_prompt, token_budget=8000, keep_recent_turns=4):
+        self.system_prompt = system_prompt
+        self._system_message = None
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        # One fact per tool call (name and arguments), the latest result winning.
+        self.facts = {}
+        # Transient system note for the current turn only, such as retrieved FAQ entries.
+        self.context = None
+        # Each turn starts with a user message (the greeting forms a turn of its own).
+        self._turns = [[]]
+        self.last_token_count = 0
+        self._token_cache = {}
+
+    def append(self, message):
+        message = to_message_dict(message)
+        if message.get("role") == "user":
+            self._turns.append([])
+        self._turns[-1].append(message)
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def replace(self, message, replacement):
+        """Swaps a stored message for `replacement`, such as a reply the caller cut short."""
+        for turn in reversed(self._turns):
+            for index, stored in enumerate(turn):
+                if stored is message:
+                    self._token_cache.pop(id(message), None)
+                    turn[index] = to_message_dict(replacement)
+                    return
+
+    def __iter__(self):
+        return iter(self.messages())
+
+    def __len__(self):
+        return len(self.messages())
+
+    @property
+    def system_message(self):
+        content = self.system_prompt() if callable(self.system_prompt) else self.system_prompt
+        # Keep the same dict while the prompt is unchanged so its token count stays cached.
+        if self._system_message is None or self._system_message["content"] != content:
+            self._system_message = {"role": "system", "content": content}
+        return self._system_message
+
+    def _facts_message(self):
+        if not self.facts:
+            return None
+        lines = "\n".join(f"- {fact}" for fact in self.facts.values())
+        return {"role": "system", "content": f"Facts established earlier in this call:\n{lines}"}
+
+    def _notes(self):
+        """The system notes sent with the stored turns; rebuilt on every request."""
+        notes = []
+        facts = self._facts_message()
+        if facts:
+            notes.append(facts)
+        if self.context:
+            notes.append({"role": "system", "content": self.context})
+        return notes
+
+    def _assemble(self):
+        # The facts change only when old turns are compacted, so they sit with the
+        # system prompt. The per-turn context goes right after the latest user
+        # message, so everything before it stays the same from one request to the
+        # next and can be served from the provider's prompt cache.
+        messages = [self.system_message]
+        facts = self._facts_message()
+        if facts:
+            messages.append(facts)
+        for turn in self._turns[:-1]:
+            messages.extend(turn)
+        latest = self._turns[-1]
+        split = 1 if latest and latest[0].get("role") == "user" else len(latest)
+        messages.extend(latest[:split])
+        if self.context:
+            messages.append({"role": "system", "content": self.context})
+        messages.extend(latest[split:])
+        return messages
+
+    def _tokens(self, message):
+        # Messages are never modified once stored, so their counts can be reused.
+        cached = self._token_cache.get(id(message))
+        if cached is None or cached[0] is not message:
+            cached = (message, message_tokens(message))
+            self._token_cache[id(message)] = cached
+        return cached[1]
+
+    def _total_tokens(self):
+        total = self._tokens(self.system_message) + sum(message_tokens(note) for note in self._notes())
+        return total + sum(self._tokens(message) for turn in self._turns for message in turn)
+
+    def _compact_turn(self, turn):
+        """Replaces a turn's tool calls and results with facts. Returns True if anything changed."""
+        arguments = {}
+        kept = []
+        changed = False
+        for message in turn:
+            if message.get("tool_calls"):
+                for tool_call in message["tool_calls"]:
+                    arguments[tool_call["id"]] = tool_call["function"]
+                # Whatever the model said alongside the tool call was spoken to the caller.
+                if message.get("content"):
+                    kept.append({"role": "assistant", "content": message["content"]})
+                changed = True
+            elif message.get("role") == "tool":
+                function = arguments.get(message.get("tool_call_id"), {"name": message.get("name"), "arguments": "{}"})
+                key, fact = _describe_tool_result(function, message.get("content"))
+                # Re-inserting moves a repeated call's fact to the end, as the newest.
+                self.facts.pop(key, None)
+                self.facts[key] = fact
+                changed = True
+            else:
+                kept.append(message)
+        turn[:] = kept
+        return changed
+
+    def _trim_facts(self):
+        """Drops the oldest facts until the facts note fits in its share of the budget."""
+        limit = self.token_budget * _FACTS_BUDGET_SHARE
+        while self.facts and message_tokens(self._facts_message()) > limit:
+            del self.facts[next(iter(self.facts))]
+
+    def messages(self):
+        """Returns the messages to send, compacting old turns if the budget is exceeded."""
+        total = self._total_tokens()
+        older = len(self._turns) - self.keep_recent_turns
+        for turn in self._turns[:max(older, 0)]:
+            if total <= self.token_budget:
+                break
+            if self._compact_turn(turn):
+                self._trim_facts()
+                total = self._total_tokens()
+        while total > self.token_budget and len(self._turns) > self.keep_recent_turns:
+            for message in self._turns.pop(0):
+                self._token_cache.pop(id(message), None)
+            total = self._total_tokens()
+        self.last_token_count = total
+        return self._assemble()
+
+def _describe_tool_result(function, content):
+    """Summarizes one tool call and its result as a short fact. Returns (call, fact), the call identifying the fact."""
+    try:
+        args = json.loads(function.get("arguments") or "{}")
+    except ValueError:
+        args = {}
+    try:
+        result = json.loads(content or "{}")
+    except ValueError:
+        result = {}
+    if not isinstance(result, dict):
+        result = {}
+    arg_text = ", ".join(f"{key}={value}" for key, value in args.items())
+    details = [f"{key}={result[key]}" for key in _FACT_FIELDS if key in result]
+    status = result.get("status", "done")
+    call = f"{function.get('name')}({arg_text})"
+    fact = f"{call} -> {status}"
+    return call, f"{fact} ({', '.join(details)})" if details else fact
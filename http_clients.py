@@ -0,0 +1,95 @@
+from functools import lru_cache
+
+# Per-endpoint (read, connect) timeouts in seconds. Connecting should be quick
+# everywhere; reads wait for the slowest part of each response (the transcript,
+# the first token, the first audio byte), which differs a lot between endpoints.
+TIMEOUTS = {
+    "transcription": (15.0, 3.0),
+    "chat": (30.0, 3.0),
+    "speech": (20.0, 3.0),
+    "warmup": (5.0, 3.0),
+}
+
+# One pool per client, shared by every session. Idle connections are kept for a
+# couple of minutes so a caller's next turn does not pay for a new TLS handshake.
+POOL_LIMITS = {"max_connections": 200, "max_keepalive_connections": 50, "keepalive_expiry": 120.0}
+
+@lru_cache(maxsize=None)
+def request_timeout(endpoint):
+    """Returns the httpx.Timeout for requests to `endpoint`."""
+    # httpx and openai are imported on first use, so importing this module stays cheap.
+    import httpx
+    read, connect = TIMEOUTS[endpoint]
+    return httpx.Timeout(read, connect=connect)
+
+class OpenAIClients:
+    """
+    The OpenAI clients a process shares: an async client for transcription and
+    chat, and a sync one for speech, which is synthesized on worker threads.
+    Each keeps its own pool of keep-alive connections.
+    """
+
+    def __init__(self, api_key=None, base_url=None, max_retries=2, limits=POOL_LIMITS):
+        import httpx
+        import openai
+        limits = httpx.Limits(**limits)
+        self.async_client = openai.AsyncOpenAI(
+            api_key=api_key, base_url=base_url, max_retries=max_retries, timeout=request_timeout("chat"),
+            http_client=openai.DefaultAsyncHttpxClient(limits=limits, timeout=request_timeout("chat")),
+        )
+        self.sync_client = openai.OpenAI(
+            api_key=api_key, base_url=base_url, max_retries=max_retries, timeout=request_timeout("speech"),
+            http_client=openai.DefaultHttpxClient(limits=limits, timeout=request_timeout("speech")),
+        )
+
+    async def warm_up(self, connections=2):
+        """
+        Opens `connections` keep-alive connections in each pool with a cheap request,
+        so the first turn does not pay for DNS, TCP and TLS setup. Failures are
+        only reported; the clients still connect on demand.
+        """
+        import asyncio
+        async_client = self.async_client.with_options(max_retries=0, timeout=request_timeout("warmup"))
+        sync_client = self.sync_client.with_options(max_retries=0, timeout=request_timeout("warmup"))
+        results = await asyncio.gather(
+            *(async_client.models.list() for _ in range(connections)),
+            *(asyncio.to_thread(sync_client.models.list) for _ in range(connections)),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            print(f"Connection warmup: {len(errors)} of {len(results)} requests failed ({errors[0]}).")
+        else:
+            print(f"Connection warmup: {len(results)} connections ready.")
+
+    async def aclose(self):
+        await self.async_client.close()
+        self.sync_client.close()
+
+async def hedged(request, hedge_after, attempts=2):
+    """
+    Runs `request` (a function returning a coroutine) and, if it has not answered
+    within `hedge_after` seconds, starts another attempt alongside it, up to
+    `attempts` in all. The first success wins and the rest are cancelled. An
+    attempt that fails starts the next one right away. Only use this for
+    idempotent requests.
+    """
+    import asyncio
+    pending = {asyncio.ensure_future(request())}
+    launched = 1
+    error = None
+    try:
+        while pending:
+            timeout = hedge_after if launched < attempts else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if launched < attempts:
+                pending.add(asyncio.ensure_future(request()))
+                launched += 1
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
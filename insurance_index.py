@@ -0,0 +1,165 @@
+import heapq
+import re
+import threading
+import weakref
+from collections import Counter
+from thefuzz import process
+
+# What callers (and transcription) call some payers, by their name in the Insurance table.
+ALIASES = {
+    "Blue Cross Blue Shield": ["bcbs", "blue cross", "blue shield", "anthem"],
+    "UnitedHealthcare": ["uhc", "united", "united health", "united healthcare", "united health care"],
+    "Kaiser Permanente": ["kaiser", "kp"],
+    "Cigna": ["cigna healthcare"],
+    "Aetna": ["aetna cvs", "aetna health"],
+    "Humana": ["humana medicare"],
+    "Prudential Health": ["prudential"],
+    "Max Bupa (Niva Bupa, India)": ["niva bupa", "max bupa", "bupa"],
+    "Religare Care (Care Health)": ["religare", "care health"],
+    "New India Assurance": ["new india", "nia"],
+}
+
+# How many names survive the n-gram prefilter to be scored with fuzzy matching.
+CANDIDATES = 32
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_PARENTHESES = re.compile(r"\(([^)]*)\)")
+
+def normalize(name):
+    """Lowercases `name` and reduces it to words separated by single spaces."""
+    return _NON_WORD.sub(" ", name.lower().replace("&", " and ")).strip()
+
+def _trigrams(text):
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _keys(name):
+    """
+    The normalized names a payer can be found by, as (key, fuzzy) pairs. Only
+    its name (with and without the parts in parentheses) is scored with fuzzy
+    matching; the parts in parentheses, its initials and its aliases must be
+    said exactly, since short or generic words ("united", "medicare") score
+    highly against any longer name containing them.
+    """
+    keys = [(normalize(name), True)]
+    outside = normalize(_PARENTHESES.sub(" ", name))
+    if outside:
+        keys.append((outside, True))
+    for inside in _PARENTHESES.findall(name):
+        keys.extend((normalize(part), False) for part in inside.split(","))
+    words = outside.split()
+    if len(words) > 1:
+        keys.append(("".join(word[0] for word in words), False))
+    keys.extend((normalize(alias), False) for alias in ALIASES.get(name, ()))
+    fuzzy = {}
+    for key, is_fuzzy in keys:
+        if key:
+            fuzzy[key] = fuzzy.get(key, False) or is_fuzzy
+    return list(fuzzy.items())
+
+class InsuranceIndex:
+    """
+    An in-memory copy of the Insurance table for matching what a caller says
+    to a payer in one lookup.
+
+    Every payer is indexed under its normalized name and aliases (including
+    abbreviations such as "BCBS"). A query that is exactly one of these keys
+    matches at once. Otherwise the payer names sharing the most character
+    trigrams with it (by Dice coefficient) are scored with thefuzz, as the tools
+    used to score the whole table, so the cost of a lookup hardly grows with the
+    number of payers. Aliases are never fuzzy-matched. Keys shared by several
+    payers (say, "india") are dropped as ambiguous.
+    """
+
+    def __init__(self, rows):
+        self.payers = [
+            {"insurance_id": insurance_id, "name": name, "is_supported": bool(is_supported), "diseases_covered": diseases or ""}
+            for insurance_id, name, is_supported, diseases in rows
+        ]
+        owners = {}
+        fuzzy_keys = set()
+        for position, payer in enumerate(self.payers):
+            for key, fuzzy in _keys(payer["name"]):
+                owners.setdefault(key, set()).add(position)
+                if fuzzy:
+                    fuzzy_keys.add(key)
+        self._exact = {key: positions.pop() for key, positions in owners.items() if len(positions) == 1}
+        self._key_list = [key for key in self._exact if key in fuzzy_keys]
+        self._postings = {}
+        self._gram_counts = []
+        for key_id, key in enumerate(self._key_list):
+            grams = _trigrams(key)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(key_id)
+
+    def match(self, insurance_name, threshold=80):
+        """
+        Returns (payer, score) for the payer best matching `insurance_name`, or
+        (None, score) if even the best scores below `threshold`. A payer is a dict
+        with insurance_id, name, is_supported and diseases_covered.
+        """
+        query = normalize(insurance_name or "")
+        position = self._exact.get(query)
+        if position is not None:
+            return self.payers[position], 100
+        if not query or not self._key_list:
+            return None, 0
+
+        grams = _trigrams(query)
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self._postings.get(gram, ()))
+        # Rank by the Dice coefficient rather than the raw overlap, so long names
+        # sharing a few common trigrams do not crowd out a short exact word.
+        ranked = heapq.nlargest(CANDIDATES, overlap.items(),
+                                key=lambda item: item[1] / (len(grams) + self._gram_counts[item[0]]))
+        candidates = {key_id: self._key_list[key_id] for key_id, _ in ranked}
+        if not candidates:
+            return None, 0
+        _, score, key_id = process.extractOne(query, candidates)
+        if score < threshold:
+            return None, score
+        return self.payers[self._exact[self._key_list[key_id]]], score
+
+_VERSION_QUERY = "SELECT Version FROM TableVersions WHERE TableName = 'Insurance'"
+
+_indexes = {}
+_paths = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+def _database_key(con):
+    """Identifies the file behind a connection, so every connection to it shares one index."""
+    try:
+        key = _paths.get(con)
+    except TypeError:
+        # Plain sqlite3.Connection objects cannot be weakly referenced; look the path up every time.
+        key = None
+    if key is None:
+        key = next((path for _, name, path in con.execute("PRAGMA database_list") if name == "main"), "")
+        # In-memory databases are private to their connection.
+        key = key or f"memory:{id(con)}"
+        try:
+            _paths[con] = key
+        except TypeError:
+            pass
+    return key
+
+def insurance_index(con):
+    """
+    Returns the InsuranceIndex for the database behind `con`, building it on
+    first use and again whenever the Insurance table has changed since (the
+    table's triggers count changes in TableVersions), in this or any other process.
+    """
+    key = _database_key(con)
+    version = con.execute(_VERSION_QUERY).fetchone()[0]
+    cached = _indexes.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _lock:
+        cached = _indexes.get(key)
+        if cached is None or cached[0] != version:
+            rows = con.execute("SELECT InsuranceId, InsuranceName, IsSupported, DiseasesCovered FROM Insurance").fetchall()
+            cached = (version, InsuranceIndex(rows))
+            _indexes[key] = cached
+    return cached[1]
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+from audio_io import NullSink
+from http_clients import OpenAIClients
+from mock_openai_server import MockOpenAIServer, add_arguments, encode_utterance, mock_from_args
+import tracing
+from tracing import percentile
+
+# What each simulated caller says, one line per turn.
+CALLER_LINES = [
+    "Hi, what are your hours on weekdays?",
+    "Do you accept Aetna insurance?",
+    "Great, I'd like to book an appointment for my knee.",
+    "It's Jane Doe, jane dot doe at example dot com.",
+]
+
+async def run_caller(agent, lines, start_delay):
+    """Plays one caller through a call; returns a list of (turn timings or None, error or None)."""
+    await asyncio.sleep(start_delay)
+    session = agent.session(source=SimpleNamespace(fs=16000, channels=1))
+    results = []
+    await session.greet("Hello, thank you for calling Stemmee Surgery Center. My name is Jay.")
+    for line in lines:
+        try:
+            await session.run_turn(encode_utterance(line), 16000)
+            results.append((session.turn_timings[-1], None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+async def run_load(agent, clients, callers, lines, ramp, seed=None):
+    """Starts `callers` simulated calls spread over `ramp` seconds and waits for them all."""
+    await clients.warm_up(connections=min(callers, 8))
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    try:
+        calls = await asyncio.gather(*(run_caller(agent, lines, rng.uniform(0, ramp)) for _ in range(callers)))
+    finally:
+        await clients.aclose()
+    return [result for call in calls for result in call], time.perf_counter() - start
+
+def report(results, elapsed, mock, agent):
+    totals = [timings["total"] for timings, error in results if error is None]
+    first_audio = [timings["first_audio"] for timings, error in results if error is None and "first_audio" in timings]
+    errors = [error for _, error in results if error is not None]
+
+    print(f"\n{len(results)} turns in {elapsed:.2f}s: {len(totals) / elapsed:.1f} turns/s, "
+          f"{len(errors)} failed ({len(errors) / max(1, len(results)):.1%}).")
+    print(f"{'':<14}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for label, values in (("turn total", totals), ("first audio", first_audio)):
+        if values:
+            print(f"{label:<14}" + "".join(f"{percentile(values, p):>8.0f}ms" for p in (50, 95, 99)))
+    kinds = {}
+    for error in errors:
+        kinds[type(error).__name__] = kinds.get(type(error).__name__, 0) + 1
+    for name, count in sorted(kinds.items()):
+        print(f"  {name}: {count}")
+    requests = ", ".join(f"{path.rsplit('/', 1)[-1]} {count}" for path, count in sorted(mock.requests.items()))
+    print(f"Mock server: {requests}; {mock.errors} injected errors.")
+    print(f"Pools: {agent.io_workers or 'default'} I/O threads (JAY_IO_WORKERS), "
+          f"{agent.synthesizer.max_workers} synthesis threads (JAY_TTS_WORKERS).")
+    prefetch = agent.prefetch_stats
+    if prefetch and prefetch.hits + prefetch.misses:
+        print(f"Patient prefetch: {prefetch.hit_rate:.0%} of {prefetch.hits + prefetch.misses} patient lookups served "
+              f"from {prefetch.lookups} prefetches, {prefetch.saved_ms / max(1, prefetch.hits):.1f} ms saved per hit.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Drive simulated callers through Jay against a local mock of the OpenAI API.")
+    parser.add_argument("--callers", type=int, default=20, help="Number of simultaneous callers.")
+    parser.add_argument("--ramp", type=float, default=1.0, help="Seconds over which the callers join.")
+    parser.add_argument("--realtime", action="store_true", help="Play replies at real-time speed instead of discarding them.")
+    parser.add_argument("--trace", help="Write per-stage trace spans to this JSONL file.")
+    parser.add_argument("--hedge-after", type=float,
+                        help="Hedge transcriptions slower than this many seconds with a second request.")
+    add_arguments(parser)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.trace:
+        tracing.configure(os.path.abspath(args.trace))
+    mock = mock_from_args(args)
+    server = MockOpenAIServer(mock).start()
+
+    # Work in a scratch directory so the load test never touches the real clinic_data.db.
+    scratch = tempfile.mkdtemp()
+    for name in ("prompt_template.txt", "faq.csv"):
+        shutil.copy(name, scratch)
+    os.chdir(scratch)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from database import initialize_database
+        from main import create_agent, create_synthesizer
+        db_connection = initialize_database()
+        clients = OpenAIClients(api_key="mock", base_url=server.base_url, max_retries=0)
+        synthesizer = create_synthesizer(clients.sync_client, NullSink(realtime=args.realtime))
+        agent = create_agent(clients.async_client, db_connection, synthesizer)
+        agent.transcribe_hedge_after = args.hedge_after
+
+    print(f"Running {args.callers} callers x {len(CALLER_LINES)} turns against {server.base_url}...")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            results, elapsed = asyncio.run(run_load(agent, clients, args.callers, CALLER_LINES, args.ramp, args.seed))
+        report(results, elapsed, mock, agent)
+    finally:
+        agent.close()
+        db_connection.close()
+        server.stop()
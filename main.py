@@ -1,256 +1,220 @@
-import openai
-import sounddevice as sd
-import soundfile as sf
-import numpy as np
+import argparse
 import os
-import json
+import time
 from dotenv import load_dotenv
-import csv
-import pytz
-from datetime import datetime
-from database import (
-    initialize_database, check_insurance_coverage, add_patient, 
-    get_patient_details, book_appointment, cancel_appointment,
-    update_patient, reschedule_appointment
-)
+import tracing
+from http_clients import OpenAIClients
 
-load_dotenv()
-
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# Importing this module is kept cheap: the audio, API and database modules (and
+# numpy, openai, sounddevice, thefuzz and friends behind them) are imported when
+# they are first needed, mostly on the startup threads in start_up().
 
-def create_system_prompt():
-    """
-    Creates the initial system prompt by reading a template and injecting FAQ and current date.
-    """
-    timezone = pytz.timezone('America/New_York')
-    now = datetime.now(timezone)
-    current_date = now.strftime('%Y-%m-%d')
-    current_day = now.strftime('%A')
+load_dotenv()
 
-    with open('prompt_template.txt', 'r') as f:
-        prompt_template = f.read()
+# How many FAQ entries to send with each turn; 0 puts the whole FAQ in the system prompt.
+FAQ_TOP_K = int(os.getenv("JAY_FAQ_TOP_K", "3"))
 
-    faq_string = ""
-    with open('faq.csv', 'r', newline='') as f:
-        reader = csv.reader(f)
-        next(reader)
-        for row in reader:
-            faq_string += f"Q: {row[1]}\nA: {row[2]}\n\n"
-    
-    return prompt_template.format(
-        faq_content=faq_string.strip(),
-        current_date=current_date,
-        current_day=current_day
-    )
+INITIAL_GREETING = "Hello, thank you for calling Stemmee Surgery Center. My name is Jay. How can I help you today?"
 
-conversation_history = [
-    {"role": "system", "content": create_system_prompt()}
+# Lines Jay says over and over (as is ERROR_PHRASE); synthesized once and then served from the TTS cache.
+COMMON_PHRASES = [
+    "Okay, booking that for you now, please hold.",
+    "Okay, rescheduling that for you now, please hold.",
+    "Thank you, I've found your record.",
+    "Sorry, I didn't catch that. Could you please repeat it?",
+    "Is there anything else I can help you with?",
 ]
 
-db_connection = initialize_database()
+# FAQ entries Jay should not answer word for word: it books appointments itself
+# rather than telling callers to phone the office, and checks the caller's
+# insurance with check_insurance_coverage rather than answering in general.
+FAQ_ROUTER_EXCLUDED = {"How can I book an appointment?", "Do you accept insurance?"}
+
+# Other ways callers ask FAQ questions, so the router recognizes them too.
+FAQ_ROUTER_PHRASINGS = {
+    "Where is Stemmee Surgery Center located?": [
+        "Where are you located?", "Where is the clinic?", "Where is the clinic located?",
+        "What's your address?", "What is the clinic's address?", "How do I get to the clinic?",
+    ],
+    "What phone numbers can I use to contact the clinic?": [
+        "What's your phone number?", "What is the clinic's phone number?", "What number can I call?",
+        "How can I contact the clinic?",
+    ],
+    "What are your clinic hours?": [
+        "What are your hours?", "What are your hours on weekdays?", "When are you open?",
+        "Are you open on Saturday?", "What time do you close?",
+    ],
+    "How long does a typical appointment take?": ["How long does an appointment take?", "How long is an appointment?"],
+    "What should I bring to my first appointment?": ["What should I bring?", "What do I need to bring?"],
+    "Who are the doctors at Stemmee Surgery Center?": ["Who are your doctors?", "Which doctors work there?"],
+    "What conditions do you treat?": ["What do you treat?"],
+    "How can I get a copy of my medical records?": ["How do I get my medical records?", "Can I get a copy of my records?"],
+    "Can family members accompany me during my appointment?": [
+        "Can someone come with me to the appointment?", "Can I bring a family member?",
+    ],
+}
 
 tools = [
     {"type": "function", "function": {"name": "check_insurance_coverage", "description": "Checks if a patient's insurance is supported...", "parameters": {"type": "object", "properties": {"insurance_name": {"type": "string"}}, "required": ["insurance_name"]}}},
     {"type": "function", "function": {"name": "add_patient", "description": "Adds a new patient record...", "parameters": {"type": "object", "properties": {"patient_name": {"type": "string"}, "phone_number": {"type": "string"}, "patient_email": {"type": "string"}, "illness": {"type": "string"}, "insurance_name": {"type": "string"}}, "required": ["patient_name", "phone_number", "patient_email", "illness", "insurance_name"]}}},
     {"type": "function", "function": {"name": "get_patient_details", "description": "Looks up an existing patient...", "parameters": {"type": "object", "properties": {"patient_name": {"type": "string"}, "patient_email": {"type": "string"}}, "required": ["patient_name", "patient_email"]}}},
+    {"type": "function", "function": {"name": "find_available_slots", "description": "Finds the next free appointment slots with the doctor for an illness...", "parameters": {"type": "object", "properties": {"illness": {"type": "string"}, "from_date": {"type": "string"}, "days": {"type": "integer"}, "n": {"type": "integer"}}, "required": ["illness"]}}},
     {"type": "function", "function": {"name": "book_appointment", "description": "Books an appointment...", "parameters": {"type": "object", "properties": {"patient_id": {"type": "integer"}, "appointment_date": {"type": "string"}, "appointment_time": {"type": "string"}, "illness": {"type": "string"}}, "required": ["patient_id", "appointment_date", "appointment_time", "illness"]}}},
     {"type": "function", "function": {"name": "cancel_appointment", "description": "Cancels an existing appointment...", "parameters": {"type": "object", "properties": {"patient_id": {"type": "integer"}, "appointment_date": {"type": "string"}, "appointment_time": {"type": "string"}}, "required": ["patient_id", "appointment_date", "appointment_time"]}}},
     {"type": "function", "function": {"name": "update_patient", "description": "Updates a patient's record...", "parameters": {"type": "object", "properties": {"patient_id": {"type": "integer"}, "new_phone_number": {"type": "string"}, "new_insurance_name": {"type": "string"}, "new_patient_email": {"type": "string"}}, "required": ["patient_id"]}}},
     {"type": "function", "function": {"name": "reschedule_appointment", "description": "Reschedules an existing appointment...", "parameters": {"type": "object", "properties": {"patient_id": {"type": "integer"}, "old_appointment_date": {"type": "string"}, "old_appointment_time": {"type": "string"}, "new_appointment_date": {"type": "string"}, "new_appointment_time": {"type": "string"}}, "required": ["patient_id", "old_appointment_date", "old_appointment_time", "new_appointment_date", "new_appointment_time"]}}}
 ]
 
-def record_audio(fs=44100, channels=1, silence_threshold=0.01, silence_seconds=2.0, max_record_seconds=20):
-    """
-    Records audio from the microphone, stopping after a period of silence.
-    """
-    print(f"\nListening... (stops after {silence_seconds}s of silence)")
-    check_interval = 15
-    blocksize = fs // check_interval
-    silent_blocks_needed = int(silence_seconds * check_interval)
-    max_blocks = max_record_seconds * check_interval
-    pre_buffer_size = check_interval // 2
-    
-    stream = sd.InputStream(samplerate=fs, channels=channels, blocksize=blocksize, dtype='float32')
-    
-    recorded_frames = []
-    pre_buffer = []
-    silent_blocks_count = 0
-    recording_started = False
-    
-    with stream:
-        for _ in range(max_blocks):
-            audio_chunk, overflowed = stream.read(blocksize)
-            rms = np.sqrt(np.mean(audio_chunk**2))
-            is_silent = rms < silence_threshold
-
-            if recording_started:
-                recorded_frames.append(audio_chunk)
-                if is_silent:
-                    silent_blocks_count += 1
-                else:
-                    silent_blocks_count = 0
-                
-                if silent_blocks_count >= silent_blocks_needed:
-                    print("Silence detected. Stopping recording.")
-                    break
-            else:
-                if not is_silent:
-                    print("Speech detected, starting recording.")
-                    recording_started = True
-                    recorded_frames.extend(pre_buffer)
-                    recorded_frames.append(audio_chunk)
-                else:
-                    pre_buffer.append(audio_chunk)
-                    if len(pre_buffer) > pre_buffer_size:
-                        pre_buffer.pop(0)
-        else:
-            print("Maximum recording time reached.")
-
-    print("Recording finished.")
-    
-    if not recorded_frames:
-        return np.array([], dtype='float32'), fs
-        
-    recording = np.concatenate(recorded_frames, axis=0)
-    
-    num_trailing_silent_frames = silent_blocks_count * blocksize
-    if num_trailing_silent_frames > 0 and len(recording) > num_trailing_silent_frames:
-        recording = recording[:-num_trailing_silent_frames]
-
-    return recording, fs
+def tool_functions():
+    """Maps each tool's name to its function in database.py."""
+    import database
+    return {tool["function"]["name"]: getattr(database, tool["function"]["name"]) for tool in tools}
+
+def create_synthesizer(client, sink, cache=None):
+    """Builds the speech synthesizer, its worker pool sized from the environment."""
+    from speech import SpeechSynthesizer
+    return SpeechSynthesizer(client=client, cache=cache, sink=sink, max_workers=int(os.getenv("JAY_TTS_WORKERS", "3")))
+
+def create_agent(client, db_connection, synthesizer=None):
+    """Builds the agent shared by every conversation in this process, configured from the environment."""
+    from agent import Agent
+    from faq import RETRIEVED_FAQ_NOTE, load_faq
+    from prompt_builder import PromptBuilder
+    faq_threshold = None
+    if os.getenv("JAY_FAQ_ROUTER", "1") != "0":
+        faq_threshold = int(os.getenv("JAY_FAQ_THRESHOLD", "85"))
+    hedge_after = os.getenv("JAY_TRANSCRIBE_HEDGE_AFTER")
+    return Agent(
+        client=client,
+        tools=tools,
+        available_functions=tool_functions(),
+        db_connection=db_connection,
+        prompt=PromptBuilder(faq_content=RETRIEVED_FAQ_NOTE if FAQ_TOP_K else None),
+        synthesizer=synthesizer,
+        faq_entries=load_faq(),
+        faq_top_k=FAQ_TOP_K,
+        faq_threshold=faq_threshold,
+        faq_excluded=FAQ_ROUTER_EXCLUDED,
+        faq_phrasings=FAQ_ROUTER_PHRASINGS,
+        token_budget=int(os.getenv("JAY_HISTORY_TOKEN_BUDGET", "8000")),
+        templated_replies=os.getenv("JAY_TEMPLATED_REPLIES", "1") != "0",
+        transcribe_hedge_after=float(hedge_after) if hedge_after else None,
+        prefetch_patients=os.getenv("JAY_PATIENT_PREFETCH", "1") != "0",
+        io_workers=int(os.getenv("JAY_IO_WORKERS", "32")),
+    )
 
-def play_audio(data, fs):
-    """Plays back audio."""
-    print("Playing audio...")
-    sd.play(data, fs)
-    sd.wait()
-    print("Playback finished.")
+def open_source(args):
+    """Creates the caller audio source and gets its device ready."""
+    from audio_io import MicrophoneSource, FileSource
+    source = FileSource(args.input_wav, realtime=args.realtime) if args.input_wav else MicrophoneSource()
+    source.prepare()
+    return source
 
-def main():
-    initial_greeting = "Hello, thank you for calling Stemmee Surgery Center. My name is Jay. How can I help you today?"
-    print(f"\nJay: {initial_greeting}")
-    conversation_history.append({"role": "assistant", "content": initial_greeting})
+def open_database():
+    from database import initialize_database
+    return initialize_database()
 
+def start_up(args, sink):
+    """
+    Initializes everything a call needs. The independent steps (the audio
+    devices, the database, the API clients and the agent) run side by side, and
+    the greeting is synthesized while the audio devices open.
+    Returns (source, db_connection, clients, synthesizer, agent).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from speech import PCM_SAMPLE_RATE
+    from tts_cache import TTSCache
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="startup") as startup:
+        source_ready = startup.submit(open_source, args)
+        sink_ready = startup.submit(sink.prepare, PCM_SAMPLE_RATE)
+        database_ready = startup.submit(open_database)
+
+        clients = OpenAIClients(api_key=os.getenv("OPENAI_API_KEY"))
+        synthesizer = create_synthesizer(clients.sync_client, sink, cache=TTSCache())
+        # The greeting is needed right away; the other phrases warm up once the call starts.
+        greeting_ready = synthesizer.prewarm([INITIAL_GREETING])
+        db_connection = database_ready.result()
+        agent = create_agent(clients.async_client, db_connection, synthesizer)
+
+        source = source_ready.result()
+        sink_ready.result()
+        for future in greeting_ready:
+            future.result()
+    return source, db_connection, clients, synthesizer, agent
+
+async def run_call(session, clients):
+    """Runs one call, opening API connections while the greeting plays."""
+    import asyncio
+    warmup = asyncio.create_task(clients.warm_up())
     try:
-        with openai.audio.speech.with_streaming_response.create(
-            model="tts-1", voice="alloy", input=initial_greeting,
-        ) as response:
-            response.stream_to_file("greeting.mp3")
-        data, fs = sf.read("greeting.mp3")
-        play_audio(data, fs)
-    except Exception as e:
-        print(f"An error occurred during the initial greeting: {e}")
+        await session.run(INITIAL_GREETING)
     finally:
-        if os.path.exists("greeting.mp3"):
-            os.remove("greeting.mp3")
-
-    try:
-        while True:
-            audio_data, sample_rate = record_audio()
-
-            if audio_data.size == 0:
-                print("No audio recorded, listening again.")
-                continue
-            
-            temp_file = "temp_recording.wav"
-            sf.write(temp_file, audio_data, sample_rate)
-
-            try:
-                with open(temp_file, "rb") as audio_file:
-                    transcript = openai.audio.transcriptions.create(
-                        model="whisper-1", 
-                        file=audio_file
-                    )
-                
-                user_message = transcript.text
-                print(f"You said: {user_message}")
-
-                if "goodbye" in user_message.lower():
-                    print("Goodbye!")
-                    break
-
-                conversation_history.append({"role": "user", "content": user_message})
-
-                print("Sending to OpenAI...")
-                response = openai.chat.completions.create(
-                    model="gpt-4o",
-                    messages=conversation_history,
-                    tools=tools,
-                    tool_choice="auto"
-                )
-                
-                response_message = response.choices[0].message
-                tool_calls = response_message.tool_calls
-
-                if tool_calls:
-                    interim_message = response_message.content
-                    if interim_message:
-                        print(f"Jay (interim): {interim_message}")
-                        with openai.audio.speech.with_streaming_response.create(
-                            model="tts-1", voice="alloy", input=interim_message
-                        ) as interim_response:
-                            interim_response.stream_to_file("interim_response.mp3")
-                        data, fs = sf.read("interim_response.mp3")
-                        play_audio(data, fs)
-                        os.remove("interim_response.mp3")
-
-                    available_functions = {
-                        "check_insurance_coverage": check_insurance_coverage,
-                        "add_patient": add_patient,
-                        "get_patient_details": get_patient_details,
-                        "book_appointment": book_appointment,
-                        "cancel_appointment": cancel_appointment,
-                        "update_patient": update_patient,
-                        "reschedule_appointment": reschedule_appointment,
-                    }
-                    
-                    conversation_history.append(response_message)
-                    
-                    for tool_call in tool_calls:
-                        function_name = tool_call.function.name
-                        function_to_call = available_functions[function_name]
-                        function_args = json.loads(tool_call.function.arguments)
-                        
-                        function_response = function_to_call(con=db_connection, **function_args)
-                        
-                        conversation_history.append({
-                                "tool_call_id": tool_call.id,
-                                "role": "tool",
-                                "name": function_name,
-                                "content": json.dumps(function_response),
-                            })
-                    
-                    second_response = openai.chat.completions.create(
-                        model="gpt-4o",
-                        messages=conversation_history,
-                    )
-                    assistant_message = second_response.choices[0].message.content
-                else:
-                    assistant_message = response_message.content
-
-                print(f"OpenAI said: {assistant_message}")
-
-                if assistant_message:
-                    conversation_history.append({"role": "assistant", "content": assistant_message})
-
-                with openai.audio.speech.with_streaming_response.create(
-                    model="tts-1",
-                    voice="alloy",
-                    input=assistant_message,
-                ) as response:
-                    response.stream_to_file("response.mp3")
+        await warmup
+        await clients.aclose()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run Jay, the clinic's voice agent.")
+    parser.add_argument("--input-wav", help="Use a recorded call from this WAV file instead of the microphone.")
+    parser.add_argument("--realtime", action="store_true",
+                        help="Feed --input-wav at real-time speed instead of as fast as possible.")
+    parser.add_argument("--output-wav", help="Capture Jay's speech to this WAV file instead of playing it.")
+    parser.add_argument("--no-playback", action="store_true", help="Discard Jay's speech instead of playing it.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    startup_start = time.perf_counter()
+    args = parse_args(argv)
+    # Per-stage latency spans for every turn; summarize them with `python3 tracing.py <file>`.
+    tracing.configure(os.getenv("JAY_TRACE_FILE"))
+    import asyncio
+    from audio_io import SpeakerSink, NullSink, CaptureSink
+    from barge_in import BargeInMonitor
+    from conversation_engine import ERROR_PHRASE
+    from speech import PCM_SAMPLE_RATE, PCM_SAMPLE_WIDTH
+
+    if args.output_wav:
+        sink = CaptureSink(args.output_wav)
+    elif args.no_playback:
+        sink = NullSink(realtime=args.realtime)
+    else:
+        sink = SpeakerSink()
+
+    source, db_connection, clients, synthesizer, agent = start_up(args, sink)
+    startup_end = time.perf_counter()
+    tracing.record("startup", startup_start, startup_end)
+    print(f"Ready for the call in {(startup_end - startup_start) * 1000:.0f} ms.")
+
+    # Full-duplex mode: keep listening while Jay speaks so callers can interrupt.
+    # Works best with a headset, since speaker output can leak into the microphone.
+    barge_in = None
+    if os.getenv("JAY_BARGE_IN") == "1":
+        if args.input_wav and not args.realtime:
+            print("Barge-in needs --realtime with --input-wav; continuing without it.")
+        else:
+            barge_in = BargeInMonitor(source)
 
-                data, fs = sf.read("response.mp3")
-                play_audio(data, fs)
+    session = agent.session(source=source, barge_in=barge_in)
 
-            except Exception as e:
-                print(f"An error occurred: {e}")
-            finally:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-                if os.path.exists("response.mp3"):
-                    os.remove("response.mp3")
+    try:
+        synthesizer.prewarm(COMMON_PHRASES + [ERROR_PHRASE])
+        asyncio.run(run_call(session, clients))
     finally:
+        if isinstance(sink, CaptureSink):
+            sink.save()
+            for record in sink.utterances:
+                seconds = len(record["bytes"]) / (PCM_SAMPLE_RATE * PCM_SAMPLE_WIDTH)
+                print(f"Captured reply: {seconds:.2f}s of audio.")
+        faq_router = agent.faq_router
+        if faq_router and faq_router.queries:
+            print(f"FAQ router: answered {faq_router.hits} of {faq_router.queries} turns locally ({faq_router.hit_rate:.0%}).")
+        prefetch = agent.prefetch_stats
+        if prefetch and prefetch.hits + prefetch.misses:
+            print(f"Patient prefetch: {prefetch.hits} of {prefetch.hits + prefetch.misses} patient lookups served from "
+                  f"{prefetch.lookups} prefetches ({prefetch.hit_rate:.0%}), {prefetch.saved_ms:.0f} ms saved; "
+                  f"{prefetch.contacts_reused} bookings took the patient's contact from it.")
+        cache_stats = synthesizer.cache.stats()
+        print(f"\nTTS cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} phrases cached.")
+        agent.close()
         if db_connection:
             db_connection.close()
             print("\nDatabase connection closed.")
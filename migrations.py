@@ -0,0 +1,175 @@
+import argparse
+import sqlite3
+import sys
+from db_pool import connect
+
+# The schema is versioned with PRAGMA user_version: a database at version N has
+# had the first N migrations below applied. Migrations only ever get appended;
+# to change the schema, add a new one rather than editing an old one.
+
+INSURANCE_DATA = [
+    (1, 'Aetna', 1, 'Cardiology, Diabetes, Cancer, Orthopedics, Pediatrics'),
+    (2, 'Blue Cross Blue Shield', 1, 'General, Heart Disease, Mental Health, Orthopedics, Respiratory Disorders'),
+    (3, 'UnitedHealthcare', 1, 'Diabetes, Hypertension, Cardiology, Maternity, Pediatrics'),
+    (4, 'Cigna', 1, 'Oncology, Cardiology, Dermatology, Gastroenterology'),
+    (5, 'Humana', 0, 'Diabetes, Cancer, Kidney Disorders, Vision & Dental'),
+    (6, 'Kaiser Permanente', 1, 'Pediatrics, Cardiology, Diabetes, Preventive Care'),
+    (7, 'Allianz Care', 1, 'Global Health, Critical Illness, Mental Health, Maternity'),
+    (8, 'Prudential Health', 1, 'Cancer, Diabetes, Cardiology, Orthopedics, Chronic Illness'),
+    (9, 'Manulife', 1, 'Diabetes, Heart Disease, Stroke, Cancer, General Care'),
+    (10, 'ICICI Lombard (India)', 1, 'Cancer, Diabetes, Cardiology, COVID-19, Critical Illness'),
+    (11, 'HDFC ERGO Health (India)', 1, 'Orthopedics, Maternity, Cancer, Diabetes, Neurology'),
+    (12, 'Star Health (India)', 1, 'Pediatrics, Diabetes, Heart Disease, Cancer, Maternity'),
+    (13, 'Max Bupa (Niva Bupa, India)', 1, 'Cancer, Diabetes, Cardiology, Pediatrics, Respiratory Disorders'),
+    (14, 'Religare Care (Care Health)', 1, 'Diabetes, Cancer, Stroke, Heart Disease, Critical Illness'),
+    (15, 'New India Assurance', 1, 'General, Cancer, Diabetes, Heart Disease, Neurological Disorders')
+]
+
+def _create_tables(cur):
+    """Creates the Insurance, Patients and Appointments tables and populates Insurance."""
+    # IF NOT EXISTS, so databases created before versioning start from here too.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS Insurance (
+            InsuranceId INTEGER PRIMARY KEY,
+            InsuranceName TEXT NOT NULL,
+            IsSupported INTEGER NOT NULL, -- Using 1 for Yes, 0 for No
+            DiseasesCovered TEXT
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS Patients (
+            PatientId INTEGER PRIMARY KEY AUTOINCREMENT,
+            PatientName TEXT,
+            PatientPhoneNumber TEXT,
+            PatientEmail TEXT UNIQUE,
+            PatientIllness TEXT,
+            InsuranceId INTEGER,
+            FOREIGN KEY (InsuranceId) REFERENCES Insurance(InsuranceId)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS Appointments (
+            AppointmentId INTEGER PRIMARY KEY AUTOINCREMENT,
+            AppointmentTimeStart TEXT,
+            AppointmentTimeEnd TEXT,
+            DoctorName TEXT,
+            PatientId INTEGER,
+            FOREIGN KEY (PatientId) REFERENCES Patients(PatientId)
+        )
+    """)
+    cur.execute("SELECT COUNT(*) FROM Insurance")
+    if cur.fetchone()[0] == 0:
+        cur.executemany("INSERT INTO Insurance VALUES (?, ?, ?, ?)", INSURANCE_DATA)
+        print(f"Insurance table populated with {len(INSURANCE_DATA)} records.")
+
+def _index_lookups(cur):
+    """Indexes the patient's appointments (cancel, reschedule, upcoming) and the phone number lookup."""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_appointments_patient_start ON Appointments (PatientId, AppointmentTimeStart)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_patients_phone ON Patients (PatientPhoneNumber)")
+
+def _unique_doctor_slot(cur):
+    """Allows one appointment per doctor and start time; the index also serves the availability checks."""
+    cur.execute(
+        "SELECT DoctorName, AppointmentTimeStart, COUNT(*) FROM Appointments "
+        "GROUP BY DoctorName, AppointmentTimeStart HAVING COUNT(*) > 1"
+    )
+    duplicates = cur.fetchall()
+    if duplicates:
+        doctor, start, count = duplicates[0]
+        raise sqlite3.IntegrityError(
+            f"{len(duplicates)} slots are double-booked (e.g. {doctor} at {start}, {count} times); "
+            "resolve them before migrating."
+        )
+    # SQLite cannot add a table constraint to an existing table; a unique index enforces the same thing.
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_appointments_doctor_start ON Appointments (DoctorName, AppointmentTimeStart)")
+
+def _track_insurance_changes(cur):
+    """Counts changes to the Insurance table, so cached copies of it know when to reload."""
+    cur.execute("CREATE TABLE IF NOT EXISTS TableVersions (TableName TEXT PRIMARY KEY, Version INTEGER NOT NULL)")
+    cur.execute("INSERT OR IGNORE INTO TableVersions VALUES ('Insurance', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS insurance_after_{event.lower()} AFTER {event} ON Insurance
+            BEGIN
+                UPDATE TableVersions SET Version = Version + 1 WHERE TableName = 'Insurance';
+            END
+        """)
+
+MIGRATIONS = [
+    _create_tables,
+    _index_lookups,
+    _unique_doctor_slot,
+    _track_insurance_changes,
+]
+
+# Hot queries and the index each should use, checked with EXPLAIN QUERY PLAN.
+QUERY_PLAN_CHECKS = [
+    ("SELECT AppointmentId FROM Appointments WHERE DoctorName = ? AND AppointmentTimeStart = ?",
+     "ux_appointments_doctor_start"),
+    ("SELECT AppointmentTimeStart FROM Appointments WHERE DoctorName = ? AND AppointmentTimeStart >= ? AND AppointmentTimeStart < ?",
+     "ux_appointments_doctor_start"),
+    ("SELECT AppointmentId FROM Appointments WHERE PatientId = ? AND AppointmentTimeStart = ?",
+     "idx_appointments_patient_start"),
+    ("SELECT AppointmentId, DoctorName, AppointmentTimeStart FROM Appointments WHERE PatientId = ? AND AppointmentTimeStart >= ? ORDER BY AppointmentTimeStart",
+     "idx_appointments_patient_start"),
+    ("SELECT PatientId, PatientName FROM Patients WHERE PatientPhoneNumber = ?",
+     "idx_patients_phone"),
+    ("SELECT PatientId FROM Patients WHERE PatientEmail = ?",
+     "sqlite_autoindex_Patients_1"),
+    ("SELECT Version FROM TableVersions WHERE TableName = ?",
+     "sqlite_autoindex_TableVersions_1"),
+]
+
+def schema_version(con):
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(con):
+    """
+    Applies the migrations the database has not had yet, each in its own
+    transaction together with the version bump, so a failed migration leaves the
+    database at the previous version. Returns the schema version.
+    """
+    if con.in_transaction:
+        con.commit()
+    while True:
+        # IMMEDIATE takes the write lock up front, so two processes starting
+        # together cannot both apply the same migration.
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            version = schema_version(con)
+            if version >= len(MIGRATIONS):
+                con.commit()
+                return version
+            migration = MIGRATIONS[version]
+            migration(con.cursor())
+            con.execute(f"PRAGMA user_version = {version + 1}")
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+        print(f"Database migrated to version {version + 1}: {migration.__doc__.splitlines()[0]}")
+
+def check_query_plans(con):
+    """Returns (statement, expected index, plan, ok) for each of QUERY_PLAN_CHECKS."""
+    results = []
+    for statement, index in QUERY_PLAN_CHECKS:
+        params = (None,) * statement.count("?")
+        plan = " / ".join(row[3] for row in con.execute(f"EXPLAIN QUERY PLAN {statement}", params))
+        results.append((statement, index, plan, f"INDEX {index}" in plan))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bring the clinic database up to date and check the hot queries' plans.")
+    parser.add_argument("path", nargs="?", default="clinic_data.db", help="The SQLite database file.")
+    args = parser.parse_args()
+
+    con = connect(args.path)
+    try:
+        print(f"Schema version {migrate(con)} of {len(MIGRATIONS)}.")
+        failures = 0
+        for statement, index, plan, ok in check_query_plans(con):
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {statement}\n     expected {index}: {plan}")
+    finally:
+        con.close()
+    sys.exit(1 if failures else 0)
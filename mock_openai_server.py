@@ -0,0 +1,324 @@
+import argparse
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import wave
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bytes of 24 kHz 16-bit PCM per character of input, matching speech.PCM_BYTES_PER_CHAR.
+PCM_BYTES_PER_CHAR = 3400
+SPEECH_CHUNK_SIZE = 4096
+
+DEFAULT_REPLY = "Of course. Could you tell me a little more so I can help?"
+
+# Rules are tried in order; the first whose pattern matches the caller's words answers.
+# A rule with a tool call first returns `interim` with the call, then `reply`
+# once the tool result comes back.
+DEFAULT_SCRIPT = [
+    {"match": r"\bhours?\b|\bopen\b",
+     "reply": "Our standard hours are Monday to Friday, 8 AM to 5 PM. Is there anything else I can help with?"},
+    {"match": r"insurance|aetna|blue cross|cigna",
+     "interim": "Let me check that for you.",
+     "tool_call": {"name": "check_insurance_coverage", "arguments": {"insurance_name": "Aetna"}},
+     "reply": "Yes, we accept Aetna. Would you like to book an appointment?"},
+    {"match": r"@|\bat\b.+\bdot\b",
+     "interim": "Thank you, let me look up your record.",
+     "tool_call": {"name": "get_patient_details",
+                   "arguments": {"patient_name": "Jane Doe", "patient_email": "jane.doe@example.com"}},
+     "reply": "I couldn't find a record under that email, so let's create one. What's your phone number?"},
+    {"match": r"book|appointment",
+     "reply": "I can help with that. Could I have your full name and email address?"},
+]
+
+class Latency:
+    """
+    A latency distribution in seconds, parsed from specs such as "0.4",
+    "fixed:0.4", "uniform:0.2,0.6", "normal:0.4,0.1" or "lognormal:0.4,0.5".
+    For "lognormal" the parameters are the median and the sigma of the log.
+    """
+
+    def __init__(self, spec, rng=None):
+        self.spec = spec
+        kind, _, params = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self.rng = rng or random.Random()
+
+    def sample(self):
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = self.rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = self.rng.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            value = median * self.rng.lognormvariate(0, sigma)
+        return max(0.0, value)
+
+def encode_utterance(text):
+    """
+    Turns a line of caller text into float samples the stand-in server can
+    "recognize": each UTF-8 byte becomes one 16-bit sample. Sent at 16 kHz the
+    samples reach the server unchanged, so transcription returns the text.
+    """
+    import numpy as np
+    data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8).astype(np.float32)
+    return ((data + 0.5) / 32767).reshape(-1, 1)
+
+def decode_utterance(wav_bytes):
+    """Recovers the text hidden in a WAV made from encode_utterance() samples."""
+    with wave.open(io.BytesIO(wav_bytes), "rb") as wav:
+        frames = wav.readframes(wav.getnframes())
+    samples = [int.from_bytes(frames[i:i + 2], "little", signed=True) for i in range(0, len(frames), 2)]
+    data = bytes(sample for sample in samples if 0 < sample < 256)
+    return data.decode("utf-8", errors="ignore")
+
+class MockOpenAI:
+    """
+    The behavior behind the stand-in server: scripted replies, simulated
+    latencies and injected errors, plus counters for what it served.
+    """
+
+    def __init__(self, script=None, transcribe_latency="0.5", chat_latency="0.4", speech_latency="0.3",
+                 words_per_second=25.0, error_rate=0.0, seed=None):
+        rng = random.Random(seed)
+        self.script = [dict(rule, pattern=re.compile(rule["match"], re.IGNORECASE)) for rule in script or DEFAULT_SCRIPT]
+        self.transcribe_latency = Latency(transcribe_latency, rng)
+        self.chat_latency = Latency(chat_latency, rng)
+        self.speech_latency = Latency(speech_latency, rng)
+        self.words_per_second = words_per_second
+        self.error_rate = error_rate
+        self.rng = rng
+        self.requests = {}
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, can_fail=True):
+        """Counts a request and decides whether to fail it."""
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            fail = can_fail and self.rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return fail
+
+    def _rule(self, text):
+        for rule in self.script:
+            if rule["pattern"].search(text or ""):
+                return rule
+        return None
+
+    def respond(self, messages, tools):
+        """Returns (content, tool_call) for a chat request; tool_call is a (name, arguments) pair or None."""
+        last_user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        rule = self._rule(last_user)
+        if rule is None:
+            return DEFAULT_REPLY, None
+        tool_call = rule.get("tool_call")
+        answered = messages and messages[-1].get("role") == "tool"
+        if tool_call and tools and not answered:
+            return rule.get("interim"), (tool_call["name"], json.dumps(tool_call["arguments"]))
+        return rule["reply"], None
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOpenAI/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self):
+        self._send_json({"error": {"message": "Injected failure.", "type": "server_error"}}, status=500)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        # Clients warm their connections up by listing models.
+        if self.path.split("?")[0] != "/v1/models":
+            self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+            return
+        self.mock.record(self.path, can_fail=False)
+        self._send_json({"object": "list", "data": [
+            {"id": model, "object": "model", "created": 0, "owned_by": "mock"}
+            for model in ("gpt-4o", "whisper-1", "tts-1")
+        ]})
+
+    def do_POST(self):
+        body = self._body()
+        routes = {
+            "/v1/chat/completions": self._chat,
+            "/v1/audio/transcriptions": self._transcribe,
+            "/v1/audio/speech": self._speech,
+        }
+        route = routes.get(self.path.split("?")[0])
+        if route is None:
+            self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+            return
+        if self.mock.record(self.path):
+            self._send_error()
+            return
+        route(body)
+
+    def _transcribe(self, body):
+        message = BytesParser(policy=policy.HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("latin-1") + body
+        )
+        audio = next((part.get_payload(decode=True) for part in message.iter_parts()
+                      if part.get_param("name", header="content-disposition") == "file"), b"")
+        time.sleep(self.mock.transcribe_latency.sample())
+        self._send_json({"text": decode_utterance(audio) if audio else ""})
+
+    def _chat(self, body):
+        request = json.loads(body)
+        content, tool_call = self.mock.respond(request["messages"], request.get("tools"))
+        model = request.get("model", "gpt-4o")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        tool_calls = None
+        if tool_call:
+            tool_calls = [{"id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+                           "function": {"name": tool_call[0], "arguments": tool_call[1]}}]
+        finish_reason = "tool_calls" if tool_calls else "stop"
+        words = (content or "").split(" ") if content else []
+
+        time.sleep(self.mock.chat_latency.sample())
+        if not request.get("stream"):
+            time.sleep(len(words) / self.mock.words_per_second)
+            self._send_json({
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": finish_reason,
+                             "message": {"role": "assistant", "content": content, "tool_calls": tool_calls}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)},
+            })
+            return
+
+        def event(delta, finish=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        self._start_chunked("text/event-stream")
+        event({"role": "assistant", "content": ""})
+        for i, word in enumerate(words):
+            time.sleep(1 / self.mock.words_per_second)
+            event({"content": word if i == 0 else " " + word})
+        if tool_calls:
+            # Arguments arrive in fragments, as they do from the real API.
+            call = tool_calls[0]
+            arguments = call["function"]["arguments"]
+            half = len(arguments) // 2
+            event({"tool_calls": [{"index": 0, "id": call["id"], "type": "function",
+                                   "function": {"name": call["function"]["name"], "arguments": arguments[:half]}}]})
+            event({"tool_calls": [{"index": 0, "function": {"arguments": arguments[half:]}}]})
+        event({}, finish_reason)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _speech(self, body):
+        request = json.loads(body)
+        remaining = len(request.get("input", "")) * PCM_BYTES_PER_CHAR
+        time.sleep(self.mock.speech_latency.sample())
+        self._start_chunked("audio/pcm")
+        silence = bytes(SPEECH_CHUNK_SIZE)
+        while remaining > 0:
+            size = min(SPEECH_CHUNK_SIZE, remaining)
+            remaining -= size
+            self._write_chunk(silence[:size])
+        self._write_chunk(b"")
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the OpenAI endpoints Jay uses: chat completions
+    (including tool calls and streaming), transcription and speech.
+    Point a client at `base_url` with any API key.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, mock=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), _Handler)
+        self.mock = mock or MockOpenAI()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """Serves requests on a background thread and returns the server."""
+        threading.Thread(target=self.serve_forever, name="mock-openai", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def load_script(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+def add_arguments(parser):
+    """Adds the options that configure a MockOpenAI to an argument parser."""
+    parser.add_argument("--script", help="JSON file of scripted replies (see DEFAULT_SCRIPT for the format).")
+    parser.add_argument("--transcribe-latency", default="0.5", help="Transcription latency distribution in seconds.")
+    parser.add_argument("--chat-latency", default="0.4", help="Time to the first chat token, as a distribution in seconds.")
+    parser.add_argument("--speech-latency", default="0.3", help="Time to the first byte of speech, as a distribution in seconds.")
+    parser.add_argument("--words-per-second", type=float, default=25.0, help="Chat generation speed.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail with a 500.")
+    parser.add_argument("--seed", type=int, help="Seed for latencies and injected errors.")
+
+def mock_from_args(args):
+    return MockOpenAI(
+        script=load_script(args.script) if args.script else None,
+        transcribe_latency=args.transcribe_latency,
+        chat_latency=args.chat_latency,
+        speech_latency=args.speech_latency,
+        words_per_second=args.words_per_second,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the OpenAI API.")
+    parser.add_argument("--port", type=int, default=8089)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = MockOpenAIServer(mock_from_args(args), port=args.port)
+    print(f"Mock OpenAI API listening on {server.base_url}; set OPENAI_BASE_URL to use it.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
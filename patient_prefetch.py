@@ -0,0 +1,158 @@
+import re
+import threading
+import time
+import tracing
+from database import _correct_and_validate_email, load_patient_record, patient_details_result
+
+# Transcripts spell addresses out as often as not: "jane dot doe at example dot com".
+_SPOKEN_AT = re.compile(r"\s+at\s+", re.IGNORECASE)
+_SPOKEN_DOT = re.compile(r"\s+dot\s+", re.IGNORECASE)
+_EMAIL = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+
+def extract_emails(text):
+    """Returns the valid email addresses in a transcript, in the order they were said."""
+    text = _SPOKEN_DOT.sub(".", _SPOKEN_AT.sub("@", text))
+    emails = []
+    for candidate in _EMAIL.findall(text):
+        email, is_valid, _ = _correct_and_validate_email(candidate)
+        if is_valid and email not in emails:
+            emails.append(email)
+    return emails
+
+class PrefetchStats:
+    """
+    Counts for the patient prefetch, shared by every session of an agent. Hits
+    and misses count get_patient_details calls; bookings that took the
+    confirmation email's contact from the session's contacts are counted apart.
+    """
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+        self.contacts_reused = 0
+        self._lock = threading.Lock()
+
+    def add(self, lookups=0, hits=0, misses=0, saved_ms=0.0, contacts_reused=0):
+        with self._lock:
+            self.lookups += lookups
+            self.hits += hits
+            self.misses += misses
+            self.saved_ms += saved_ms
+            self.contacts_reused += contacts_reused
+
+    @property
+    def hit_rate(self):
+        served = self.hits + self.misses
+        return self.hits / served if served else 0.0
+
+class _Lookup:
+    __slots__ = ("future", "started_at", "finished_at")
+
+    def __init__(self, future, started_at):
+        self.future = future
+        self.started_at = started_at
+        self.finished_at = None
+
+class PatientPrefetcher:
+    """
+    Looks up a caller's patient record as soon as they say their email address.
+
+    observe() is given each transcript before it goes to the model. Any email
+    address in it is looked up on the tool executor's pool while the completion
+    is in flight, so when the model then asks for get_patient_details the answer
+    is already in this session's cache. A lookup still running when the tool is
+    called is waited for rather than repeated. Records are kept only until the
+    end of the turn, since another session may book or cancel for the patient
+    after that, and any mutating tool clears them sooner.
+
+    The name and email address of each patient found are kept for the whole
+    call, so a booking made turns later can take the confirmation email's
+    contact from them. Only update_patient and add_patient drop a contact.
+    """
+
+    def __init__(self, tool_executor, stats=None):
+        self.tool_executor = tool_executor
+        self.stats = stats if stats is not None else PrefetchStats()
+        self._lookups = {}
+        # Patient id (as a string) -> (email, name) of every patient found during the call.
+        self._contacts = {}
+        self._lock = threading.Lock()
+
+    def observe(self, text):
+        """Starts a background lookup for each new email address in `text`."""
+        for email in extract_emails(text):
+            with self._lock:
+                if email in self._lookups:
+                    continue
+                lookup = _Lookup(None, time.perf_counter())
+                lookup.future = self.tool_executor.submit_read(self._load, email, lookup)
+                self._lookups[email] = lookup
+            self.stats.add(lookups=1)
+
+    def _load(self, con, email, lookup):
+        with tracing.span("prefetch.patient"):
+            try:
+                return load_patient_record(con, email)
+            finally:
+                lookup.finished_at = time.perf_counter()
+
+    def _wait(self, lookup):
+        """Returns (record, ms saved) for a lookup, waiting for it if it is still running."""
+        wait_start = time.perf_counter()
+        record = lookup.future.result()
+        waited = time.perf_counter() - wait_start
+        return record, max(0.0, (lookup.finished_at - lookup.started_at - waited) * 1000)
+
+    def _record_for(self, email):
+        with self._lock:
+            lookup = self._lookups.get(email)
+        if lookup is None:
+            return None
+        try:
+            return self._wait(lookup)
+        except Exception as e:
+            print(f"Patient prefetch failed: {e}")
+            return None
+
+    def prepare(self, function_name, function_args):
+        """
+        Returns (result, function_args) for a tool call: the result if the call can
+        be answered from the cache, otherwise None and the arguments to run it with.
+        """
+        if function_name == "get_patient_details":
+            email, is_valid, _ = _correct_and_validate_email(str(function_args.get("patient_email", "")))
+            found = self._record_for(email) if is_valid else None
+            if found is None:
+                self.stats.add(misses=1)
+                return None, function_args
+            record, saved_ms = found
+            self.stats.add(hits=1, saved_ms=saved_ms)
+            return patient_details_result(record), function_args
+
+        if function_name == "book_appointment":
+            with self._lock:
+                contact = self._contacts.get(str(function_args.get("patient_id")))
+            if contact is not None:
+                self.stats.add(contacts_reused=1)
+                return None, dict(function_args, patient_contact=contact)
+        return None, function_args
+
+    def remember(self, function_name, function_args, result):
+        """Notes the contact of a patient a tool call found, or forgets one it changed."""
+        if not isinstance(result, dict):
+            return
+        if function_name == "get_patient_details" and result.get("status") == "found":
+            email, _, _ = _correct_and_validate_email(str(function_args.get("patient_email", "")))
+            with self._lock:
+                self._contacts[str(result["patient_id"])] = (email, result["patient_name"])
+        elif function_name in ("update_patient", "add_patient"):
+            patient_id = function_args.get("patient_id", result.get("patient_id"))
+            with self._lock:
+                self._contacts.pop(str(patient_id), None)
+
+    def invalidate(self):
+        """Drops every cached record, keeping the contacts; called after a mutating tool and at the end of each turn."""
+        with self._lock:
+            self._lookups.clear()
@@ -0,0 +1,58 @@
+import os
+from datetime import datetime
+import pytz
+from faq import format_faq, load_faq
+
+TIMEZONE = pytz.timezone('America/New_York')
+
+DATE_SECTION = """
+
+**Current Date Information:**
+- Today's Date: {current_date}
+- Today is a: {current_day}"""
+
+class PromptBuilder:
+    """
+    Builds Jay's system prompt from `prompt_template.txt` and the FAQ.
+
+    The rendered template (the static prefix) is cached and only re-read when
+    the source files change on disk, so it stays byte-identical from one
+    request to the next and provider-side prompt caching can reuse it. The
+    date, the only part that changes on its own, is appended at the end and
+    recomputed on every build, so a long-running process never goes stale
+    after midnight. Pass `faq_content` to use it in place of the full FAQ.
+    """
+
+    def __init__(self, template_path="prompt_template.txt", faq_path="faq.csv", faq_content=None):
+        self.template_path = template_path
+        self.faq_path = faq_path
+        self.faq_content = faq_content
+        self._prefix = None
+        self._mtimes = None
+
+    def _source_mtimes(self):
+        paths = [self.template_path] if self.faq_content is not None else [self.template_path, self.faq_path]
+        return tuple(os.stat(path).st_mtime_ns for path in paths)
+
+    def static_prefix(self):
+        """Returns the rendered template, re-reading the source files only if they changed."""
+        mtimes = self._source_mtimes()
+        if mtimes != self._mtimes:
+            with open(self.template_path, 'r') as f:
+                prompt_template = f.read()
+            faq_content = self.faq_content
+            if faq_content is None:
+                faq_content = format_faq(load_faq(self.faq_path))
+            self._prefix = prompt_template.format(faq_content=faq_content).rstrip()
+            self._mtimes = mtimes
+        return self._prefix
+
+    def build(self, now=None):
+        """Returns the full system prompt: the static prefix followed by today's date."""
+        now = now or datetime.now(TIMEZONE)
+        return self.static_prefix() + DATE_SECTION.format(
+            current_date=now.strftime('%Y-%m-%d'),
+            current_day=now.strftime('%A'),
+        )
+
+    __call__ = build
@@ -1,15 +1,25 @@
 import sqlite3
-import pandas as pd
+from db_pool import DATABASE_PATH, connect
+
+def format_table(columns, rows):
+    """Lays query results out as a plain-text table with aligned columns."""
+    cells = [[str(column) for column in columns]] + [["" if value is None else str(value) for value in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in cells]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
 
 def query_database():
     """
     A simple command-line tool to query the clinic_data.db SQLite database.
+    The connection is read-only, so it is safe to use while calls are running.
     """
-    db_file = "clinic_data.db"
+    db_file = DATABASE_PATH
+    con = None
     
     try:
-        con = sqlite3.connect(db_file)
-        print(f"Successfully connected to {db_file}")
+        con = connect(db_file, read_only=True)
+        print(f"Successfully connected to {db_file} (read-only)")
 
         while True:
             query = input("\nEnter your SQL query (or type 'exit' to quit): \n> ")
@@ -17,12 +27,12 @@ def query_database():
                 break
             
             try:
-                # Use pandas to execute the query and display the results in a clean table
-                df = pd.read_sql_query(query, con)
-                if df.empty:
+                cur = con.execute(query)
+                rows = cur.fetchall()
+                if cur.description is None or not rows:
                     print("Query executed successfully, but it returned no results.")
                 else:
-                    print(df.to_string())
+                    print(format_table([column[0] for column in cur.description], rows))
             except Exception as e:
                 print(f"An error occurred while executing the query: {e}")
 
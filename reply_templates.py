@@ -0,0 +1,94 @@
+import json
+from datetime import datetime
+
+# Spoken replies for tool results whose outcome needs no further reasoning,
+# keyed by tool name and then by the result's status. Placeholders are filled
+# from the tool call's arguments and the result; outcomes not listed here
+# (validation errors, database errors, ...) are left to the model, as are
+# results missing a placeholder's field (a conflict with no free slots nearby).
+TEMPLATES = {
+    "book_appointment": {
+        "success": "You're all set. Your appointment with {doctor_name} is booked for {appointment_date} at {appointment_time}. "
+                   "{email_note} Is there anything else I can help you with?",
+        "conflict": "{message} The next open times are {open_times}. Would one of those work for you?",
+    },
+    "find_available_slots": {
+        "available": "{doctor_name} has openings {open_times}. Which would you like?",
+    },
+    "cancel_appointment": {
+        "success": "Your appointment on {appointment_date} at {appointment_time} has been canceled. Is there anything else I can help you with?",
+        "not_found": "I couldn't find an appointment for you on {appointment_date} at {appointment_time}. Could you double-check the date and time?",
+    },
+    "reschedule_appointment": {
+        "success": "Your appointment has been moved to {new_appointment_date} at {new_appointment_time}. "
+                   "{email_note} Is there anything else I can help you with?",
+        "not_found": "I couldn't find your appointment on {old_appointment_date} at {old_appointment_time}. Could you double-check the original date and time?",
+    },
+    "update_patient": {
+        "success": "Your information has been updated. Is there anything else I can help you with?",
+    },
+}
+
+def _spoken_date(value):
+    try:
+        date = datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return value
+    return f"{date:%A, %B} {date.day}"
+
+def _spoken_time(value):
+    try:
+        return datetime.strptime(value, '%H:%M').strftime('%I:%M %p').lstrip('0')
+    except (TypeError, ValueError):
+        return value
+
+def _spoken_slots(slots):
+    """Reads a list of slots out day by day: "on Monday, January 6 at 9:00 AM and 9:30 AM, or on ..."."""
+    days = {}
+    for slot in slots:
+        days.setdefault(slot["appointment_date"], []).append(_spoken_time(slot["appointment_time"]))
+    parts = []
+    for date, times in days.items():
+        spoken_times = times[0] if len(times) == 1 else f"{', '.join(times[:-1])} and {times[-1]}"
+        parts.append(f"on {_spoken_date(date)} at {spoken_times}")
+    return ", or ".join(parts)
+
+def _fields(arguments, result):
+    fields = {}
+    for key, value in arguments.items():
+        if key.endswith("_date"):
+            value = _spoken_date(value)
+        elif key.endswith("_time"):
+            value = _spoken_time(value)
+        fields[key] = value
+    fields.update((key, value) for key, value in result.items() if key not in fields)
+    if "confirmation_email_sent" in result:
+        fields["email_note"] = ("A confirmation email is on its way." if result["confirmation_email_sent"]
+                                else "I wasn't able to send a confirmation email, so please make a note of the time.")
+    slots = result.get("slots") or result.get("suggested_slots")
+    if slots:
+        fields["open_times"] = _spoken_slots(slots)
+    return fields
+
+def render_reply(tool_calls, tool_messages, templates=TEMPLATES):
+    """
+    Turns the result of a single tool call into the spoken reply when its
+    outcome is covered by a template. Returns None when the model should
+    write the reply instead (several tool calls, an unexpected status, or a
+    template field the result does not provide).
+    """
+    if len(tool_calls) != 1 or len(tool_messages) != 1:
+        return None
+    function = tool_calls[0]["function"]
+    template = templates.get(function["name"], {})
+    try:
+        arguments = json.loads(function["arguments"])
+        result = json.loads(tool_messages[0]["content"])
+    except ValueError:
+        return None
+    if not isinstance(result, dict) or result.get("status") not in template:
+        return None
+    try:
+        return template[result["status"]].format(**_fields(arguments, result))
+    except (KeyError, IndexError):
+        return None
@@ -0,0 +1,290 @@
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from audio_io import SpeakerSink
+import tracing
+from http_clients import request_timeout
+
+# The speech endpoint's "pcm" format is raw 24 kHz, 16-bit, mono, little-endian audio.
+PCM_SAMPLE_RATE = 24000
+PCM_SAMPLE_WIDTH = 2
+CHUNK_SIZE = 4096
+# Roughly how much PCM one character of text turns into at a normal speaking rate.
+PCM_BYTES_PER_CHAR = 3400
+
+# Abbreviations that end in a period but never end a sentence in Jay's replies.
+_ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "st", "ave", "vs", "etc", "e.g", "i.e", "a.m", "p.m"}
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+def split_sentences(text, min_length=20):
+    """
+    Splits a reply into sentences for synthesis.
+    Fragments shorter than `min_length` are merged into the next sentence so the
+    voice does not sound choppy, and abbreviations like "Dr." do not end a sentence.
+    """
+    sentences = []
+    current = ""
+    for piece in _SENTENCE_END.split(text.strip()):
+        current = f"{current} {piece}" if current else piece
+        last_word = current.rsplit(None, 1)[-1].rstrip('.!?').lower()
+        if last_word in _ABBREVIATIONS and current.endswith('.'):
+            continue
+        if len(current) < min_length:
+            continue
+        sentences.append(current)
+        current = ""
+    if current:
+        if sentences and len(current) < min_length:
+            sentences[-1] = f"{sentences[-1]} {current}"
+        else:
+            sentences.append(current)
+    return sentences
+
+class SentenceStreamer:
+    """
+    Collects streamed text and releases sentences as soon as they are complete,
+    using the same rules as split_sentences().
+    """
+
+    def __init__(self, min_length=20):
+        self.min_length = min_length
+        self._buffer = ""
+
+    def feed(self, text):
+        """Adds a chunk of text and returns the sentences it completed."""
+        self._buffer += text
+        # A sentence is only known to be complete once whitespace follows its end.
+        if not _SENTENCE_END.search(self._buffer):
+            return []
+        sentences = split_sentences(self._buffer, self.min_length)
+        if len(sentences) < 2:
+            return []
+        # The last sentence may still be growing, so keep it buffered. It is made of
+        # whole pieces between sentence ends; find where the first of them starts.
+        boundaries = [match.end() for match in _SENTENCE_END.finditer(self._buffer)]
+        pieces = _SENTENCE_END.split(self._buffer)
+        for start in range(len(pieces) - 1, 0, -1):
+            if " ".join(pieces[start:]) == sentences[-1]:
+                self._buffer = self._buffer[boundaries[start - 1]:]
+                return sentences[:-1]
+        return []
+
+    def flush(self):
+        """Returns whatever text is left once the stream has ended."""
+        sentences = split_sentences(self._buffer, self.min_length) if self._buffer.strip() else []
+        self._buffer = ""
+        return sentences
+
+class Utterance:
+    """
+    One spoken reply, made of sentences that are synthesized concurrently and
+    played back strictly in the order they were added.
+    """
+
+    def __init__(self, synthesizer):
+        self._synthesizer = synthesizer
+        self._sentences = queue.Queue()
+        self._pending = []
+        self.cancelled = threading.Event()
+        self.started_at = time.perf_counter()
+        self.texts = []
+        # Bytes written to the device per sentence, and which sentences finished playing.
+        self.played_bytes = []
+        self.completed = 0
+        self.first_audio_at = None
+
+    def add(self, sentence):
+        """Queues a sentence for synthesis; its audio is played after the previous ones."""
+        chunks = queue.Queue()
+        self.texts.append(sentence)
+        self.played_bytes.append(0)
+        self._sentences.put(chunks)
+        future = self._synthesizer.pool.submit(tracing.wrap(self._synthesizer.fetch), sentence, chunks, self.cancelled)
+        self._pending.append((future, chunks))
+
+    def finish(self):
+        """Marks the end of the reply; play() returns once everything queued has played."""
+        self._sentences.put(None)
+
+    def cancel(self):
+        """Stops playback and drops any sentences that have not been synthesized yet."""
+        self.cancelled.set()
+        for future, chunks in self._pending:
+            if future.cancel():
+                # A cancelled fetch never runs, so close its queue on its behalf.
+                chunks.put(None)
+        self._sentences.put(None)
+
+    def play(self, stream):
+        """
+        Writes each sentence's audio to `stream` as soon as it is available.
+        Returns the time to first audio in milliseconds, measured from when the
+        utterance was started, or None if nothing played.
+        """
+        first_audio_ms = None
+        index = 0
+        while not self.cancelled.is_set():
+            chunks = self._sentences.get()
+            if chunks is None:
+                break
+            while not self.cancelled.is_set():
+                chunk = chunks.get()
+                if chunk is None:
+                    self.completed = index + 1
+                    break
+                if first_audio_ms is None:
+                    self.first_audio_at = time.perf_counter()
+                    first_audio_ms = (self.first_audio_at - self.started_at) * 1000
+                stream.write(chunk)
+                self.played_bytes[index] += len(chunk)
+            index += 1
+        return first_audio_ms
+
+    @property
+    def interrupted(self):
+        """True if playback was cancelled before the whole reply was heard."""
+        return self.cancelled.is_set() and self.completed < len(self.texts)
+
+    def heard_text(self):
+        """
+        Returns the part of the reply the caller actually heard: every sentence that
+        finished playing plus the words of the current one, estimated from how much
+        of its audio was written before playback stopped.
+        """
+        heard = self.texts[:self.completed]
+        if self.completed < len(self.texts):
+            partial = self.texts[self.completed]
+            words = partial.split()
+            fraction = self.played_bytes[self.completed] / (len(partial) * PCM_BYTES_PER_CHAR)
+            spoken = int(len(words) * min(fraction, 1.0))
+            if spoken:
+                heard.append(" ".join(words[:spoken]))
+        return " ".join(heard)
+
+class SpeechSynthesizer:
+    """
+    Turns replies into speech by synthesizing sentences in parallel on a bounded
+    worker pool and streaming them to the output device in order.
+    """
+
+    def __init__(self, model="tts-1", voice="alloy", max_workers=3, client=None, cache=None, sink=None):
+        if client is None:
+            # The openai module's default client; imported here to keep importing this module cheap.
+            import openai
+            client = openai
+        self.model = model
+        self.voice = voice
+        self.client = client
+        self.cache = cache
+        self.sink = sink if sink is not None else SpeakerSink()
+        self.max_workers = max_workers
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+
+    def fetch(self, text, chunks, cancelled):
+        """
+        Puts the raw PCM for `text` into the `chunks` queue, ending with None.
+        Cached phrases are served from disk; anything else is downloaded and,
+        if it arrives completely, added to the cache.
+        """
+        with tracing.span("tts.synthesize", chars=len(text)) as span:
+            span.set(cached=self._fetch(text, chunks, cancelled))
+
+    def _fetch(self, text, chunks, cancelled):
+        """Does the work of fetch(); returns True if the phrase came from the cache."""
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(self.model, self.voice, text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                for start in range(0, len(cached), CHUNK_SIZE):
+                    chunks.put(cached[start:start + CHUNK_SIZE])
+                chunks.put(None)
+                return True
+
+        # Chunk boundaries can split a sample, so odd bytes are carried over.
+        carry = b""
+        received = []
+        complete = False
+        try:
+            with self.client.audio.speech.with_streaming_response.create(
+                model=self.model, voice=self.voice, input=text, response_format="pcm", timeout=request_timeout("speech")
+            ) as response:
+                for chunk in response.iter_bytes(chunk_size=CHUNK_SIZE):
+                    if cancelled.is_set():
+                        break
+                    data = carry + chunk
+                    usable = len(data) - len(data) % PCM_SAMPLE_WIDTH
+                    carry = data[usable:]
+                    if usable:
+                        chunks.put(data[:usable])
+                        received.append(data[:usable])
+                else:
+                    complete = True
+        except Exception as e:
+            print(f"An error occurred during speech synthesis: {e}")
+        finally:
+            chunks.put(None)
+
+        if complete and key is not None:
+            self.cache.put(key, b"".join(received))
+        return False
+
+    def prewarm(self, phrases, wait=False):
+        """
+        Synthesizes phrases into the cache ahead of time so they play instantly later.
+        Phrases are split exactly as prepare() would split them, and sentences that are
+        already cached cost nothing. Returns the futures of the submitted work.
+        """
+        if self.cache is None:
+            return []
+        futures = []
+        for phrase in phrases:
+            for sentence in split_sentences(phrase):
+                key = self.cache.make_key(self.model, self.voice, sentence)
+                if not self.cache.contains(key):
+                    futures.append(self.pool.submit(self.fetch, sentence, queue.Queue(), threading.Event()))
+        if wait:
+            for future in futures:
+                future.result()
+        return futures
+
+    def begin(self):
+        """Starts a new utterance that sentences can be added to incrementally."""
+        return Utterance(self)
+
+    def prepare(self, text):
+        """
+        Starts synthesizing `text` in the background and returns its Utterance.
+        Playing it later with play() overlaps synthesis with whatever happens meanwhile.
+        """
+        utterance = self.begin()
+        if text:
+            for sentence in split_sentences(text):
+                utterance.add(sentence)
+        utterance.finish()
+        return utterance
+
+    def play(self, utterance, barge_in=None, sink=None):
+        """
+        Plays a prepared utterance on `sink` (by default the synthesizer's own). If a
+        BargeInMonitor is given, the caller speaking over the reply cancels the rest of it.
+        """
+        if not utterance.texts:
+            return utterance
+        print("Playing audio...")
+        sink = sink if sink is not None else self.sink
+        with tracing.span("tts.playback", sentences=len(utterance.texts)) as span, sink.open(PCM_SAMPLE_RATE) as stream:
+            if barge_in is not None:
+                barge_in.start(on_speech=utterance.cancel)
+            first_audio_ms = utterance.play(stream)
+            if utterance.cancelled.is_set():
+                # Drop whatever is still buffered in the device instead of draining it.
+                stream.abort()
+            span.set(interrupted=utterance.cancelled.is_set())
+        if utterance.interrupted:
+            print("Playback interrupted by the caller.")
+        elif first_audio_ms is not None:
+            print(f"Playback finished (first audio after {first_audio_ms:.0f} ms).")
+        return utterance
@@ -0,0 +1,92 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+import tracing
+from agent import Agent
+from main import tool_functions, tools
+from prompt_builder import PromptBuilder
+
+# The lookup book_appointment makes for the confirmation email when it has no contact.
+CONTACT_QUERY = "FROM Patients WHERE PatientId"
+
+class ScriptedAsyncClient:
+    """Stands in for openai.AsyncOpenAI: each completion asks for the next queued tool call, then replies."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._complete))
+        self.tool_calls = []
+
+    async def _complete(self, messages, **kwargs):
+        tool_calls = None
+        if "tools" in kwargs and self.tool_calls:
+            name, arguments = self.tool_calls.pop(0)
+            tool_calls = [SimpleNamespace(id=f"call_{name}", function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+            role="assistant", content="One moment." if tool_calls else "Done.", tool_calls=tool_calls))])
+
+def contact_queries(trace_path, turn):
+    """Counts the contact lookups traced in one turn."""
+    with open(trace_path) as f:
+        events = [json.loads(line) for line in f]
+    return sum(1 for event in events
+               if event["turn"] == turn and event["name"] == "sql" and CONTACT_QUERY in event.get("statement", ""))
+
+async def run_call(agent, client, patient_id, slots):
+    """
+    Finds the patient, then books in the next turn, changes their record and
+    books again. Returns the session.
+    """
+    session = agent.session()
+    booking = dict(patient_id=patient_id, illness="knee pain", **slots[0])
+    client.tool_calls = [("get_patient_details", {"patient_name": "Jane Doe", "patient_email": "jane.doe@example.com"})]
+    await session.respond("It's Jane Doe, jane dot doe at example dot com.")
+    client.tool_calls = [("book_appointment", booking)]
+    await session.respond("The first slot works for me.")
+    client.tool_calls = [("update_patient", {"patient_id": patient_id, "new_phone_number": "555-0102"})]
+    await session.respond("My phone number changed to 555-0102.")
+    client.tool_calls = [("book_appointment", dict(booking, **slots[1]))]
+    await session.respond("Can I book the second slot as well?")
+    return session
+
+if __name__ == "__main__":
+    # Work in a scratch directory so the check never touches the real clinic_data.db or sends email.
+    prompt_template = os.path.abspath("prompt_template.txt")
+    os.chdir(tempfile.mkdtemp())
+    os.environ.pop("SENDGRID_API_KEY", None)
+    trace_path = os.path.abspath("traces.jsonl")
+    tracing.configure(trace_path)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from database import add_patient, find_available_slots, initialize_database
+        db_connection = initialize_database()
+        patient_id = add_patient(db_connection, "Jane Doe", "555-0101", "jane.doe@example.com", "knee pain", "Aetna")["patient_id"]
+        slots = find_available_slots(db_connection, "knee pain", n=2)["slots"]
+
+    client = ScriptedAsyncClient()
+    agent = Agent(
+        client=client,
+        tools=tools,
+        available_functions=tool_functions(),
+        db_connection=db_connection,
+        prompt=PromptBuilder(template_path=prompt_template, faq_content=""),
+        streaming=False,
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(run_call(agent, client, patient_id, slots))
+    agent.close()
+    db_connection.close()
+    tracing.configure(None)
+
+    checks = [
+        ("a booking the turn after the lookup reuses the contact", contact_queries(trace_path, 2) == 0),
+        ("a booking after update_patient looks the contact up again", contact_queries(trace_path, 4) == 1),
+        ("reused contacts are counted", agent.prefetch_stats.contacts_reused == 1),
+    ]
+    for label, passed in checks:
+        print(f"{'ok' if passed else 'FAIL'}: {label}")
+    sys.exit(0 if all(passed for _, passed in checks) else 1)
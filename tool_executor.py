@@ -0,0 +1,170 @@
+import contextlib
+import json
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import tracing
+from db_pool import ConnectionPool
+
+# Tools that only read from the database. Anything not listed here is treated as mutating.
+READ_ONLY_TOOLS = frozenset({
+    "check_insurance_coverage",
+    "get_patient_details",
+    "check_availability",
+    "find_available_slots",
+})
+
+def _patient_key(function_args):
+    """Identifies the patient a mutating call touches, so calls for the same patient stay in order."""
+    for key in ("patient_id", "patient_email"):
+        if function_args.get(key) is not None:
+            return (key, str(function_args[key]).strip().lower())
+    return None
+
+def _database_path(con):
+    """Returns the file behind a connection, or None for in-memory databases."""
+    if con is None:
+        return None
+    for _, name, path in con.execute("PRAGMA database_list"):
+        if name == "main":
+            return path or None
+    return None
+
+class ToolExecutor:
+    """
+    Runs the tool calls of one model response.
+
+    Read-only tools run concurrently on a thread pool, each worker reading
+    through its own read-only connection. Mutating tools are chained per
+    patient so that, say, an update and a booking for the same patient happen
+    in the order the model asked for them, and each holds a lock for its
+    patient, so sessions do not interleave writes to the same patient. Writes
+    for different patients go ahead side by side on per-thread connections: in
+    WAL mode with a busy timeout SQLite queues their commits, and the unique
+    slot index turns a booking race into a conflict. An in-memory database has
+    only the shared connection, so there every write takes one lock. Results
+    come back in the order of the tool calls, whatever order they finish in.
+    """
+
+    def __init__(self, available_functions, db_connection, read_only=READ_ONLY_TOOLS, max_workers=4):
+        self.available_functions = available_functions
+        self.db_connection = db_connection
+        self.read_only = read_only
+        self._db_path = _database_path(db_connection)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tools")
+        self._write_lock = threading.Lock()
+        self._patient_locks = weakref.WeakValueDictionary()
+        self._readers = ConnectionPool(self._db_path, read_only=True) if self._db_path else None
+        self._writers = ConnectionPool(self._db_path) if self._db_path else None
+
+    def _reader(self):
+        """Returns this worker thread's read-only connection."""
+        return self._readers.connection()
+
+    def _writer(self):
+        """Returns this thread's writable connection, or the shared one for in-memory databases."""
+        return self._writers.connection() if self._writers is not None else self.db_connection
+
+    def _lock_for(self, function_args):
+        """Returns the lock a mutating call holds while it runs: its patient's, if it names one."""
+        if self._writers is None:
+            return self._write_lock
+        key = _patient_key(function_args)
+        if key is None:
+            return contextlib.nullcontext()
+        with self._write_lock:
+            lock = self._patient_locks.get(key)
+            if lock is None:
+                # Held only while in use, so the table does not grow with every patient seen.
+                lock = self._patient_locks[key] = threading.Lock()
+        return lock
+
+    def _read(self, fn, args):
+        if self._db_path:
+            return fn(self._reader(), *args)
+        with self._write_lock:
+            return fn(self.db_connection, *args)
+
+    def submit_read(self, fn, *args):
+        """
+        Runs fn(con, *args) on the pool with a read-only connection and returns its
+        Future. Used for lookups made ahead of the tool calls that need them.
+        """
+        return self._pool.submit(tracing.wrap(self._read), fn, args)
+
+    def _call(self, tool_call, prefetcher=None):
+        function_name = tool_call["function"]["name"]
+        function_to_call = self.available_functions[function_name]
+        function_args = json.loads(tool_call["function"]["arguments"])
+
+        start = time.perf_counter()
+        function_response = None
+        if prefetcher is not None:
+            function_response, function_args = prefetcher.prepare(function_name, function_args)
+        if function_response is not None:
+            print(f"Answered {function_name} from the patient prefetch.")
+        elif function_name in self.read_only and self._db_path:
+            with tracing.span(f"tool.{function_name}"):
+                function_response = function_to_call(con=self._reader(), **function_args)
+        else:
+            with self._lock_for(function_args):
+                with tracing.span(f"tool.{function_name}"):
+                    function_response = function_to_call(con=self._writer(), **function_args)
+            if prefetcher is not None:
+                prefetcher.invalidate()
+        if prefetcher is not None:
+            prefetcher.remember(function_name, function_args, function_response)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        message = {
+            "tool_call_id": tool_call["id"],
+            "role": "tool",
+            "name": function_name,
+            "content": json.dumps(function_response),
+        }
+        return message, (function_name, elapsed_ms)
+
+    def _call_chain(self, tool_calls, prefetcher=None):
+        return [self._call(tool_call, prefetcher) for tool_call in tool_calls]
+
+    def execute(self, tool_calls, prefetcher=None):
+        """
+        Runs the tool calls and returns (tool_messages, timings): the messages in the
+        original order, and a (tool name, milliseconds) pair for each call.
+        With a `prefetcher`, calls it has already answered are served from its cache.
+        """
+        if len(tool_calls) == 1:
+            results = [self._call(tool_calls[0], prefetcher)]
+        else:
+            # One job per read-only call, and one chain per patient for mutating calls.
+            jobs = []
+            chains = {}
+            for index, tool_call in enumerate(tool_calls):
+                if tool_call["function"]["name"] in self.read_only:
+                    jobs.append([index])
+                    continue
+                key = _patient_key(json.loads(tool_call["function"]["arguments"])) or ("call", index)
+                if key not in chains:
+                    chains[key] = []
+                    jobs.append(chains[key])
+                chains[key].append(index)
+
+            futures = [
+                (indexes, self._pool.submit(tracing.wrap(self._call_chain), [tool_calls[i] for i in indexes], prefetcher))
+                for indexes in jobs
+            ]
+            results = [None] * len(tool_calls)
+            for indexes, future in futures:
+                for index, result in zip(indexes, future.result()):
+                    results[index] = result
+
+        timings = [timing for _, timing in results]
+        print("Tool timings: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in timings))
+        return [message for message, _ in results], timings
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        for pool in (self._readers, self._writers):
+            if pool is not None:
+                pool.close()
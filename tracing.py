@@ -0,0 +1,195 @@
+import argparse
+import atexit
+import contextvars
+import functools
+import json
+import sqlite3
+import threading
+import time
+
+# Which call and turn the current code is working for. asyncio tasks and
+# asyncio.to_thread carry these along; thread pools need wrap().
+_call = contextvars.ContextVar("trace_call", default=None)
+_turn = contextvars.ContextVar("trace_turn", default=None)
+
+class Tracer:
+    """
+    Appends finished spans to a JSONL file, one object per line:
+    {"call", "turn", "name", "start" (epoch seconds), "ms", "thread", ...attributes}.
+
+    Writes go through a large buffer under a lock, so recording a span costs a
+    json.dumps and a memory copy; the file is flushed on close and at exit.
+    """
+
+    def __init__(self, path, buffer_size=1 << 16):
+        self.path = path
+        self._file = open(path, "a", buffering=buffer_size)
+        self._lock = threading.Lock()
+
+    def write(self, name, start, duration_ms, attrs):
+        event = {
+            "call": _call.get(),
+            "turn": _turn.get(),
+            "name": name,
+            "start": round(start, 6),
+            "ms": round(duration_ms, 3),
+            "thread": threading.current_thread().name,
+        }
+        if attrs:
+            event.update(attrs)
+        line = json.dumps(event) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+_tracer = None
+
+def configure(path):
+    """Starts writing spans to `path`; with a falsy path, tracing stays off."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = Tracer(path) if path else None
+    if _tracer is not None:
+        atexit.register(_tracer.close)
+    return _tracer
+
+def set_context(call, turn):
+    """Tags the spans that follow in this task or thread with a call id and turn number."""
+    _call.set(call)
+    _turn.set(turn)
+
+def wrap(fn):
+    """Binds `fn` to the current trace context, for work handed to a thread pool."""
+    if _tracer is None:
+        return fn
+    return functools.partial(contextvars.copy_context().run, fn)
+
+def record(name, start, end, **attrs):
+    """Records a span that has already finished; `start` and `end` come from time.perf_counter()."""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.write(name, time.time() - (time.perf_counter() - start), (end - start) * 1000, attrs)
+
+class _Span:
+    __slots__ = ("name", "attrs", "_start")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        record(self.name, self._start, end, **self.attrs)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name, **attrs):
+    """
+    Times the enclosed block as a span named `name`. When tracing is off this
+    returns a shared no-op context manager, so it is safe on hot paths.
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(name, attrs)
+
+class TracedCursor(sqlite3.Cursor):
+    """A cursor that records a "sql" span for every statement it runs (the statement text, never the parameters)."""
+
+    def execute(self, sql, parameters=()):
+        if _tracer is None:
+            return super().execute(sql, parameters)
+        with _Span("sql", {"statement": " ".join(sql.split())[:120]}):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if _tracer is None:
+            return super().executemany(sql, seq_of_parameters)
+        with _Span("sql", {"statement": " ".join(sql.split())[:120]}):
+            return super().executemany(sql, seq_of_parameters)
+
+class TracedConnection(sqlite3.Connection):
+    """Pass as `factory=` to sqlite3.connect() so every cursor, including con.execute(), is traced."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # The built-in shortcuts create their cursor internally, bypassing cursor().
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def percentile(values, p):
+    """Nearest-rank percentile of `values`, or None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(p / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def load_spans(paths):
+    spans = []
+    for path in paths:
+        with open(path, "r") as f:
+            spans.extend(json.loads(line) for line in f if line.strip())
+    return spans
+
+def summarize(spans, by_statement=False):
+    """Groups spans by stage and returns rows of (stage, count, calls, p50, p95, p99, max, total) in ms."""
+    groups = {}
+    for event in spans:
+        stage = event["name"]
+        if by_statement and stage == "sql":
+            stage = f"sql: {event.get('statement', '')}"
+        groups.setdefault(stage, []).append(event)
+    rows = []
+    for stage, events in groups.items():
+        durations = [event["ms"] for event in events]
+        calls = len({event["call"] for event in events})
+        rows.append((stage, len(durations), calls, percentile(durations, 50), percentile(durations, 95),
+                     percentile(durations, 99), max(durations), sum(durations)))
+    return sorted(rows, key=lambda row: row[7], reverse=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print per-stage latency percentiles from Jay's trace files.")
+    parser.add_argument("paths", nargs="+", help="JSONL trace files written with JAY_TRACE_FILE.")
+    parser.add_argument("--sql", action="store_true", help="Break the sql stage down by statement.")
+    args = parser.parse_args()
+
+    spans = load_spans(args.paths)
+    calls = {event["call"] for event in spans if event["call"] is not None}
+    print(f"{len(spans)} spans from {len(calls)} calls.\n")
+    rows = summarize(spans, args.sql)
+    width = max([len(row[0]) for row in rows] + [5])
+    print(f"{'stage':<{width}} {'count':>7} {'calls':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'total':>10}")
+    for stage, count, n_calls, p50, p95, p99, longest, total in rows:
+        print(f"{stage:<{width}} {count:>7} {n_calls:>6} {p50:>7.1f}ms {p95:>7.1f}ms {p99:>7.1f}ms "
+              f"{longest:>7.1f}ms {total / 1000:>9.2f}s")
@@ -0,0 +1,86 @@
+import io
+import time
+import wave
+from functools import lru_cache
+import numpy as np
+import tracing
+from http_clients import hedged, request_timeout
+
+# Whisper works at 16 kHz internally, so anything above that is wasted upload.
+TARGET_SAMPLE_RATE = 16000
+
+@lru_cache(maxsize=8)
+def _lowpass_taps(fs, target_fs, num_taps=63):
+    """
+    Builds a windowed-sinc low-pass filter that removes content above the
+    target Nyquist frequency before downsampling.
+    """
+    cutoff = 0.9 * (target_fs / 2) / fs
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(num_taps)
+    return (taps / taps.sum()).astype(np.float32)
+
+def resample_to_mono(audio, fs, target_fs=TARGET_SAMPLE_RATE):
+    """
+    Mixes the recording down to mono and resamples it to `target_fs`.
+    Returns a float32 array.
+    """
+    mono = audio.mean(axis=1) if audio.ndim == 2 else audio
+    mono = np.asarray(mono, dtype=np.float32)
+    if fs == target_fs or mono.size == 0:
+        return mono
+    if target_fs < fs:
+        mono = np.convolve(mono, _lowpass_taps(fs, target_fs), mode='same')
+    num_samples = int(round(mono.size * target_fs / fs))
+    positions = np.arange(num_samples) * (fs / target_fs)
+    return np.interp(positions, np.arange(mono.size), mono).astype(np.float32)
+
+def encode_wav(audio, fs, target_fs=TARGET_SAMPLE_RATE):
+    """
+    Encodes a float recording as a 16-bit mono WAV file held entirely in memory.
+    Returns a BytesIO positioned at the start of the data.
+    """
+    samples = resample_to_mono(audio, fs, target_fs)
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(target_fs)
+        wav.writeframes(pcm.tobytes())
+    buffer.seek(0)
+    return buffer
+
+async def transcribe_async(audio, fs, client, model="whisper-1", hedge_after=None):
+    """
+    Downsamples and encodes the recording in memory and sends it for
+    transcription with an openai.AsyncOpenAI client. With `hedge_after`
+    (seconds), a second identical request is sent if the first is that slow,
+    and whichever answers first is used. Returns (transcript_text, stats)
+    where stats holds the upload size and timings.
+    """
+    encode_start = time.perf_counter()
+    payload = encode_wav(audio, fs).getvalue()
+    request_start = time.perf_counter()
+    tracing.record("stt.encode", encode_start, request_start, bytes=len(payload))
+
+    def request():
+        return client.audio.transcriptions.create(
+            model=model,
+            file=("speech.wav", payload, "audio/wav"),
+            timeout=request_timeout("transcription"),
+        )
+
+    with tracing.span("stt.request", model=model, hedged=hedge_after is not None):
+        transcript = await (request() if hedge_after is None else hedged(request, hedge_after))
+    encode_ms = (request_start - encode_start) * 1000
+    transcribe_ms = (time.perf_counter() - request_start) * 1000
+    print(f"Transcription upload: {len(payload) / 1024:.1f} KB, encoded in {encode_ms:.1f} ms, "
+          f"transcribed in {transcribe_ms:.0f} ms.")
+    stats = {
+        "bytes_sent": len(payload),
+        "encode_ms": round(encode_ms, 1),
+        "transcribe_ms": round(transcribe_ms, 1),
+    }
+    return transcript.text, stats
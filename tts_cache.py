@@ -0,0 +1,104 @@
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+def normalize_text(text):
+    """Normalizes text so trivially different spellings of a phrase share a cache entry."""
+    return " ".join(unicodedata.normalize('NFKC', text).split())
+
+class TTSCache:
+    """
+    Content-addressed on-disk cache of synthesized speech.
+
+    Entries are raw PCM files named after a hash of (model, voice, normalized text).
+    The total size is bounded; when it is exceeded the least recently used entries
+    are deleted. Recency is kept in file modification times so it survives restarts.
+    """
+
+    def __init__(self, directory="tts_cache", max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for name in os.listdir(directory):
+            if name.endswith('.pcm'):
+                stat = os.stat(os.path.join(directory, name))
+                files.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    @staticmethod
+    def make_key(model, voice, text):
+        """Builds the cache key for a phrase."""
+        content = f"{model}\0{voice}\0{normalize_text(text)}"
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pcm")
+
+    def contains(self, key):
+        """Checks for an entry without counting it as a hit or miss."""
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        """Returns the cached PCM bytes for `key`, or None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            os.utime(self._path(key))
+            return data
+        except OSError:
+            # The file disappeared underneath us; forget it and treat as a miss.
+            with self._lock:
+                self._total_bytes -= self._entries.pop(key, 0)
+                self.hits -= 1
+                self.misses += 1
+            return None
+
+    def put(self, key, data):
+        """Stores PCM bytes for `key`, evicting least recently used entries if needed."""
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes:
+                old_key, size = self._entries.popitem(last=False)
+                self._total_bytes -= size
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+
+    def stats(self):
+        """Returns the hit/miss counters and current size of the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
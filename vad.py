@@ -0,0 +1,204 @@
+import math
+import time
+import numpy as np
+import tracing
+
+class VoiceActivityDetector:
+    """
+    Energy-based voice activity detector built on a preallocated NumPy buffer.
+
+    The first `pre_blocks` slots of the buffer act as a ring holding the audio
+    heard just before speech starts. Once speech is detected the ring is rotated
+    into chronological order and the utterance is written straight after it, so
+    the finished recording is one contiguous region that can be returned as a
+    view without concatenating anything.
+
+    The speech threshold follows an adaptive noise floor: it drops quickly to
+    quieter blocks and rises slowly otherwise, so a noisy room does not keep
+    the recording open forever.
+    """
+
+    def __init__(self, fs=44100, channels=1, silence_threshold=0.01, silence_seconds=2.0,
+                 max_record_seconds=20, check_interval=15, speech_ratio=3.0,
+                 noise_adaptation=0.05, calibration_blocks=4):
+        self.fs = fs
+        self.channels = channels
+        self.min_threshold = silence_threshold
+        self.silence_seconds = silence_seconds
+        self.speech_ratio = speech_ratio
+        self.noise_adaptation = noise_adaptation
+        self.calibration_blocks = calibration_blocks
+
+        self.blocksize = fs // check_interval
+        self.silent_blocks_needed = int(silence_seconds * check_interval)
+        self.max_blocks = int(max_record_seconds * check_interval)
+        self.pre_blocks = check_interval // 2
+
+        # Allocate everything once; the per-block path only writes into these.
+        capacity = (self.pre_blocks + self.max_blocks) * self.blocksize
+        self._buffer = np.zeros((capacity, channels), dtype=np.float32)
+        self._scratch = np.empty((self.pre_blocks * self.blocksize, channels), dtype=np.float32)
+
+        # The noise floor survives between utterances so it keeps adapting during a call.
+        self.noise_floor = None
+        self._calibration_sum = 0.0
+        self._calibration_count = 0
+        self.reset()
+
+    @property
+    def threshold(self):
+        """The RMS level a block must exceed to count as speech."""
+        if self.noise_floor is None:
+            return self.min_threshold
+        return max(self.min_threshold, self.noise_floor * self.speech_ratio)
+
+    @property
+    def full(self):
+        """True when the buffer cannot take another full block."""
+        return self._end + self.blocksize > len(self._buffer)
+
+    def reset(self):
+        """Prepares the detector for a new utterance without reallocating the buffer."""
+        self.recording_started = False
+        self.silent_blocks_count = 0
+        self.blocks_seen = 0
+        self._ring_pos = 0
+        self._ring_filled = 0
+        self._end = 0
+
+    def _block_rms(self, block):
+        # vdot flattens and accumulates in one pass, avoiding the block**2 temporary.
+        return math.sqrt(float(np.vdot(block, block)) / block.size)
+
+    def _update_noise_floor(self, rms):
+        if self._calibration_count < self.calibration_blocks:
+            self._calibration_sum += rms
+            self._calibration_count += 1
+            self.noise_floor = self._calibration_sum / self._calibration_count
+        elif rms < self.noise_floor:
+            # Fall fast so a brief loud burst cannot inflate the floor for long.
+            self.noise_floor = rms
+        elif rms < self.threshold:
+            self.noise_floor += self.noise_adaptation * (rms - self.noise_floor)
+        else:
+            # Drift up slowly on loud blocks too, so a room that got permanently
+            # noisier is eventually absorbed, while one utterance barely moves it.
+            self.noise_floor += self.noise_adaptation * 0.05 * (rms - self.noise_floor)
+
+    def _rotate_pre_roll(self):
+        """Puts the pre-roll ring into chronological order at the start of the buffer."""
+        bs = self.blocksize
+        if self._ring_filled < self.pre_blocks:
+            # The ring never wrapped, so slots 0..filled-1 are already in order.
+            self._end = self._ring_filled * bs
+            return
+        head = self._ring_pos * bs
+        size = self.pre_blocks * bs
+        tail_len = size - head
+        self._scratch[:tail_len] = self._buffer[head:size]
+        self._scratch[tail_len:] = self._buffer[:head]
+        self._buffer[:size] = self._scratch
+        self._end = size
+
+    def process(self, block):
+        """
+        Feeds one block of audio to the detector.
+        Returns True once the utterance is complete (trailing silence reached).
+        """
+        self.blocks_seen += 1
+        frames = len(block)
+        rms = self._block_rms(block)
+        calibrating = self._calibration_count < self.calibration_blocks
+        is_silent = calibrating or rms < self.threshold
+
+        if self.recording_started:
+            self._buffer[self._end:self._end + frames] = block
+            self._end += frames
+            if is_silent:
+                self.silent_blocks_count += 1
+            else:
+                self.silent_blocks_count = 0
+            self._update_noise_floor(rms)
+            return self.silent_blocks_count >= self.silent_blocks_needed
+
+        if not is_silent:
+            self.recording_started = True
+            self._rotate_pre_roll()
+            self._buffer[self._end:self._end + frames] = block
+            self._end += frames
+            return False
+
+        self._update_noise_floor(rms)
+        if frames == self.blocksize:
+            start = self._ring_pos * self.blocksize
+            self._buffer[start:start + frames] = block
+            self._ring_pos = (self._ring_pos + 1) % self.pre_blocks
+            self._ring_filled = min(self._ring_filled + 1, self.pre_blocks)
+        return False
+
+    def utterance(self):
+        """
+        Returns the recorded utterance as a view into the internal buffer, with the
+        trailing silence trimmed. The view is overwritten by the next recording, so
+        callers that need to keep the audio past the next turn must copy it.
+        """
+        if not self.recording_started:
+            return self._buffer[:0]
+        end = self._end
+        trailing = self.silent_blocks_count * self.blocksize
+        if trailing > 0 and end > trailing:
+            end -= trailing
+        return self._buffer[:end]
+
+    def listen(self, read_block):
+        """
+        Runs the detector over blocks returned by `read_block(blocksize)` until the
+        utterance ends or the maximum recording time is reached.
+        """
+        self.reset()
+        listen_start = silence_start = time.perf_counter()
+        speech_start = None
+        for _ in range(self.max_blocks):
+            was_recording = self.recording_started
+            done = self.process(read_block(self.blocksize))
+            if self.recording_started and not was_recording:
+                speech_start = time.perf_counter()
+                tracing.record("vad.wait", listen_start, speech_start)
+                print("Speech detected, starting recording.")
+            if self.silent_blocks_count == 1:
+                silence_start = time.perf_counter()
+            if done:
+                tracing.record("vad.trailing_silence", silence_start, time.perf_counter())
+                print("Silence detected. Stopping recording.")
+                break
+        else:
+            print("Maximum recording time reached.")
+        if speech_start is None:
+            tracing.record("vad.wait", listen_start, time.perf_counter(), timed_out=True)
+        return self.utterance()
+
+def detector_for(source, silence_threshold=0.01, silence_seconds=2.0, max_record_seconds=20):
+    """
+    Creates a detector for the source's audio format. Each session needs its own,
+    since the detector's buffer holds the recording it returns.
+    """
+    return VoiceActivityDetector(
+        fs=source.fs, channels=source.channels, silence_threshold=silence_threshold,
+        silence_seconds=silence_seconds, max_record_seconds=max_record_seconds
+    )
+
+def record_audio(source, detector=None):
+    """
+    Records audio from the given source with `detector` (a new one from
+    detector_for() if None), stopping after a period of silence. The returned
+    array is a view into the detector's buffer and is reused on its next recording.
+    """
+    if detector is None:
+        detector = detector_for(source)
+    print(f"\nListening... (stops after {detector.silence_seconds}s of silence)")
+
+    with source.stream(detector.blocksize) as stream:
+        recording = detector.listen(stream.read)
+
+    print("Recording finished.")
+    return recording, source.fs